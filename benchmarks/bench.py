@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""time every stage of the pipeline on made up corpora of different sizes
+
+    python benchmarks/bench.py --sizes 10000,100000,1000000
+    python benchmarks/bench.py --compare bench-<old revision>.json
+
+each size is run twice, once for the times and once under tracemalloc for
+the peak memory of each stage, since tracemalloc slows everything down. the
+results are written as json, named after the git revision by default
+
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import yaml
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import sunburst
+from sunburst.code_parser import parse_source, parse_trace
+from sunburst.sequences import build_tree
+from sunburst.layout import compute_layout
+
+import corpus
+
+
+STAGES = ['parse_source', 'parse_trace', 'tree', 'layout', 'render', 'text',
+          'output']
+# stages with new names, so older results can still be compared
+RENAMED = {'trie': 'tree'}
+
+
+def vocab_size(n_tokens):
+    """distinct words grow roughly with the square root of the corpus"""
+    return max(100, int(10*n_tokens**0.5))
+
+
+class Stopwatch(object):
+    """times each stage, and records its peak memory if asked to"""
+
+    def __init__(self, memory):
+        self.memory = memory
+        self.results = {}
+
+    def run(self, stage, function, *args):
+        if self.memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        result = function(*args)
+        seconds = time.perf_counter() - start
+        if self.memory:
+            self.results[stage] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        else:
+            self.results[stage] = seconds
+        return result
+
+
+def pipeline(settings, source_dir, trace_lines, out_dir, memory):
+    """run every stage once, returns {stage: seconds or peak bytes}"""
+    watch = Stopwatch(memory)
+    data = settings['data']
+    layer = settings['layer']
+
+    words = watch.run('parse_source', parse_source, source_dir,
+                      data['alphabet'], data['numbers'], ['*.py'], [],
+                      data.get('processes'))
+    watch.run('parse_trace', parse_trace, iter(trace_lines),
+              data['alphabet'], data['numbers'])
+
+    tree = watch.run('tree', build_tree, words, data['max_recursion'])
+    layout = watch.run('layout', compute_layout, tree, (0, 0),
+                       layer['layer_width'], layer['sector_width'],
+                       data['max_recursion'], layer.get('min_arc', 0),
+                       layer.get('min_label', 0))
+
+    backend = sunburst.create_backend(settings['output']['format'], settings)
+    x, y = settings['output']['x'], settings['output']['y']
+    backend.bounding_box(-0.25*x, -0.5*y, x, y)
+    diagram = sunburst.Sunburst(backend, settings, source_dir, 'bench',
+                                (0, 0), ('raw',))
+    diagram.import_settings()
+    watch.run('render', diagram.render, layout)
+    watch.run('text', diagram.text_object.draw, layout)
+    watch.run('output', sunburst.output, os.path.join(out_dir, 'bench'),
+              backend)
+    return watch.results
+
+
+def revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+            stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(old, new):
+    """print how long each stage takes now relative to the old results"""
+    old_runs = {(run['tokens'], RENAMED.get(run['stage'], run['stage'])): run
+                for run in old['runs']}
+    print('%10s %-13s %10s %10s %7s' % ('tokens', 'stage', 'old s',
+                                         'new s', 'ratio'))
+    for run in new['runs']:
+        before = old_runs.get((run['tokens'], run['stage']))
+        if before is None or not before['seconds']:
+            continue
+        print('%10d %-13s %10.4f %10.4f %6.2fx' % (
+            run['tokens'], run['stage'], before['seconds'], run['seconds'],
+            run['seconds']/before['seconds']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--sizes', default='10000,100000,1000000',
+                        help='comma separated corpus sizes in tokens')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--config', default=os.path.join(ROOT, 'config.yaml'))
+    parser.add_argument('--format', default='svg',
+                        help="backend for the output stage, 'pdf' needs latex")
+    parser.add_argument('--processes', type=int, default=1,
+                        help='parse processes, 1 keeps the memory numbers '
+                             'honest')
+    parser.add_argument('--no-memory', action='store_true',
+                        help="skip the tracemalloc run")
+    parser.add_argument('--output', help='json file to write the results to')
+    parser.add_argument('--compare', help='json results of an older run')
+    args = parser.parse_args()
+
+    settings = yaml.safe_load(open(args.config))
+    settings['output']['format'] = args.format
+    settings['data']['processes'] = args.processes
+    settings['data']['cache_dir'] = None
+
+    results = {'revision': revision(),
+               'python': platform.python_version(),
+               'platform': platform.platform(),
+               'format': args.format,
+               'seed': args.seed,
+               'runs': []}
+    for size in [int(size) for size in args.sizes.split(',')]:
+        vocab = vocab_size(size)
+        with tempfile.TemporaryDirectory() as work:
+            source_dir = os.path.join(work, 'source')
+            out_dir = os.path.join(work, 'out')
+            os.makedirs(out_dir)
+            n_files = corpus.write_tree(source_dir, size, vocab, args.seed)
+            trace_lines = list(corpus.lines(size, vocab, args.seed + 2))
+
+            seconds = pipeline(settings, source_dir, trace_lines, out_dir,
+                               False)
+            peaks = {}
+            if not args.no_memory:
+                peaks = pipeline(settings, source_dir, trace_lines, out_dir,
+                                 True)
+        for stage in STAGES:
+            results['runs'].append({'tokens': size, 'vocabulary': vocab,
+                                    'files': n_files, 'stage': stage,
+                                    'seconds': seconds[stage],
+                                    'peak_bytes': peaks.get(stage)})
+            print('%10d %-13s %9.4fs %12s' % (
+                size, stage, seconds[stage],
+                '' if stage not in peaks else '%.1f MiB' % (
+                    peaks[stage]/2.0**20)))
+
+    output = args.output or 'bench-%s.json' % results['revision']
+    with open(output, 'w') as json_file:
+        json.dump(results, json_file, indent=2)
+    print('wrote', output)
+
+    if args.compare:
+        with open(args.compare) as old:
+            compare(json.load(old), results)
+
+
+if __name__ == '__main__':
+    main()
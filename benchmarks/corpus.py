@@ -0,0 +1,69 @@
+"""reproducible fake data to benchmark with. words are made up from the
+alphabet and drawn with zipf distributed frequencies, which is roughly how
+words in real code and text behave: a few very common, a long tail of rare"""
+
+import os
+
+import numpy as np
+
+
+ALPHABET = 'abcdefghijklmnopqrstuvwxyz'
+# zipf exponent, close to 1 for natural language
+EXPONENT = 1.1
+# how many tokens go on each fake line of code, and lines in each file
+LINE_TOKENS = 8
+FILE_LINES = 500
+
+
+def vocabulary(size, seed=0):
+    """size distinct made up words, mostly 2 to 10 letters long"""
+    rng = np.random.default_rng(seed)
+    words = []
+    seen = set()
+    while len(words) < size:
+        length = int(np.clip(rng.poisson(5), 1, 16))
+        word = ''.join(rng.choice(list(ALPHABET), length))
+        if word not in seen:
+            seen.add(word)
+            words.append(word)
+    return words
+
+
+def zipf_tokens(n_tokens, vocab_size, seed=0):
+    """n_tokens words sampled so the word of rank r has a frequency
+    proportional to 1/r**EXPONENT"""
+    words = vocabulary(vocab_size, seed)
+    weights = 1.0/np.arange(1, vocab_size + 1)**EXPONENT
+    rng = np.random.default_rng(seed + 1)
+    ranks = rng.choice(vocab_size, n_tokens, p=weights/weights.sum())
+    return words, ranks
+
+
+def lines(n_tokens, vocab_size, seed=0):
+    """lines of python looking code made out of the sampled words"""
+    words, ranks = zipf_tokens(n_tokens, vocab_size, seed)
+    separators = [' = ', '(', ', ', ').', ' ', '[', '] + ', ')']
+    for start in range(0, n_tokens, LINE_TOKENS):
+        line = [words[rank] for rank in ranks[start:start+LINE_TOKENS]]
+        yield ''.join(word + separators[index % len(separators)]
+                      for index, word in enumerate(line))
+
+
+def write_tree(directory, n_tokens, vocab_size, seed=0):
+    """write the lines out as a tree of .py files, a few files per package,
+    returns how many files were written"""
+    n_files = 0
+    source = None
+    for index, line in enumerate(lines(n_tokens, vocab_size, seed)):
+        if index % FILE_LINES == 0:
+            if source is not None:
+                source.close()
+            package = os.path.join(directory, 'package%d' % (n_files//20))
+            os.makedirs(package, exist_ok=True)
+            source = open(os.path.join(package, 'module%d.py' % n_files), 'w')
+            n_files += 1
+        # indent like a function body to give the parser something to strip
+        source.write('    '*(index % 3) + line + '\n')
+    if source is not None:
+        source.close()
+    return n_files
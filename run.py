@@ -1,32 +1,66 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
-import sys
+import argparse
 import os
 
-from pyx import canvas
 import yaml
 import sunburst
 
 
 def main():
+    parser = argparse.ArgumentParser(description='draw the sunburst diagrams')
+    parser.add_argument('--stats', action='store_true',
+                        help='print how long each stage took and how much '
+                             'was drawn')
+    parser.add_argument('--stats-json', metavar='FILE',
+                        help='write the same numbers to FILE as json')
+    parser.add_argument('--allocations', action='store_true',
+                        help='also record the peak memory of each stage, '
+                             'slows everything down')
+    parser.add_argument('--tree', metavar='FILE',
+                        help='draw the first diagram from counts saved by '
+                             'python -m sunburst.treefile instead of '
+                             'parsing the source')
+    parser.add_argument('--prefix',
+                        help='only draw the words starting with PREFIX')
+    parser.add_argument('--sequences', metavar='FILE',
+                        help='draw the first diagram from the lines of FILE, '
+                             'split on data.separator, like file paths')
+    args = parser.parse_args()
+    stats = sunburst.NO_STATS
+    if args.stats or args.stats_json or args.allocations:
+        stats = sunburst.Stats(args.allocations)
+
+    # read in settings
+    settings = yaml.safe_load(open('config.yaml', 'r'))
     # set up the line tracing function
-    tracer = sunburst.Trace(os.path.dirname(os.path.abspath(sunburst.__file__)),
-                            sunburst.generate_diagrams, sunburst.stop_trace)
-    sys.settrace(tracer.trace)
+    tracer = sunburst.create_trace(
+        os.path.dirname(os.path.abspath(sunburst.__file__)),
+        sunburst.generate_diagrams, sunburst.stop_trace,
+        settings.get('trace', {}).get('sample_interval'))
+    tracer.start()
     # where is the sunburst directory?
     path = os.path.dirname(os.path.abspath(sunburst.__file__))
-    # instantiate canvases
-    shape_canvas = canvas.canvas()
-    text_canvas = canvas.canvas()
-    # read in settings
-    settings = yaml.load(open('config.yaml', 'r'))
+    # pdf, svg or png
+    backend = sunburst.create_backend(settings['output'].get('format', 'pdf'),
+                                      settings)
     # list of diagrams to create
-    data = [('test', (0, 0), ('raw',)),
+    first = ('file', args.tree) if args.tree else ('raw',)
+    if args.sequences:
+        first = ('sequences', open(args.sequences, 'r'))
+    # the prefix is only for the first diagram, the trace is drawn whole
+    changes = {}
+    if args.prefix is not None:
+        changes = {'data': {'prefix': args.prefix}}
+    data = [('test', (0, 0), first, changes),
             ('test2', (settings['output']['xdelta'], 0), ('trace', tracer.lines))]
-    sunburst.generate_diagrams(data, shape_canvas, text_canvas, settings,
-                               path)
-    sunburst.output(settings['output']['name'], shape_canvas, text_canvas)
+    sunburst.generate_diagrams(data, backend, settings, path, stats)
+    sunburst.output(settings['output']['name'], backend, stats)
     print(tracer.traced)
+    if args.stats or args.allocations:
+        print(stats.report())
+    if args.stats_json:
+        stats.to_json(args.stats_json)
 
 
 if __name__ == '__main__':
@@ -1,5 +1,39 @@
 """create the sunburst module"""
 
-# for convenience
-from .sunburst import Sunburst, generate_diagrams, output, stop_trace
-from .trace import Trace
+import importlib
+
+# for convenience. these are only imported the first time they're used, so
+# counting words with sunburst.code_parser doesn't pay for numpy or any of
+# the renderers
+EXPORTS = {
+    'Sunburst': 'sunburst',
+    'generate_diagrams': 'sunburst',
+    'output': 'sunburst',
+    'stop_trace': 'sunburst',
+    'Trace': 'trace',
+    'MonitorTrace': 'trace',
+    'create_trace': 'trace',
+    'SampleTrace': 'trace',
+    'create_backend': 'backends',
+    'Stats': 'stats',
+    'NO_STATS': 'stats',
+    'DiagramState': 'incremental',
+    'Pipeline': 'pipeline',
+    'build_tree': 'sequences',
+    'count_sequences': 'sequences',
+}
+
+__all__ = sorted(EXPORTS)
+
+
+def __getattr__(name):
+    if name not in EXPORTS:
+        raise AttributeError("module 'sunburst' has no attribute '%s'" % name)
+    value = getattr(importlib.import_module('.'+EXPORTS[name], __name__), name)
+    # next time it's found without coming back here
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(EXPORTS))
@@ -0,0 +1,71 @@
+"""the renderers that turn the laid out diagram into a file
+
+every backend draws the same primitives: batches of ring sectors, straight
+lines, bezier curves, dots and labels. coordinates are in the same units as
+config.yaml with y pointing up, colours are (r, g, b) tuples from 0 to 1.
+anything drawn on the 'text' layer ends up on top of the 'shapes' layer
+
+"""
+
+SHAPES = 'shapes'
+TEXT = 'text'
+
+
+class Backend(object):
+    """the interface every backend implements"""
+
+    def bounding_box(self, x, y, width, height):
+        """the area of the page, drawn first"""
+        raise NotImplementedError
+
+    def fill_sectors(self, origin, sectors, fill_color, layer=SHAPES):
+        """fill ring sectors around origin, each sector is a tuple of
+        (inner_r, outer_r, start_angle, end_angle) in degrees"""
+        raise NotImplementedError
+
+    def stroke_lines(self, lines, line_color, width, layer=SHAPES):
+        """stroke straight lines, each one is (x0, y0, x1, y1)"""
+        raise NotImplementedError
+
+    def stroke_curves(self, curves, line_color, width, layer=SHAPES):
+        """stroke bezier curves, each one is (x0, y0, x1, y1, x2, y2, x3, y3)
+        with the two control points in the middle"""
+        raise NotImplementedError
+
+    def fill_circles(self, centres, radius, fill_color, layer=TEXT):
+        """fill dots of the same radius at every (x, y) in centres"""
+        raise NotImplementedError
+
+    def prepare_labels(self, labels, text_color):
+        """called with every distinct label before any are drawn, so they can
+        be typeset in one go. returns how many went through a text engine"""
+        return 0
+
+    def draw_label(self, label, x, y, angle, text_color):
+        """draw a label centred on (x, y), rotated by angle degrees"""
+        raise NotImplementedError
+
+    def output(self, file_name):
+        """write everything out, the backend adds the file extension.
+        returns the name of the file written"""
+        raise NotImplementedError
+
+
+def create_backend(name, settings):
+    """create the backend called name, 'pdf', 'svg' or 'png'. only the
+    backend asked for is imported, so pyx isn't needed for svg, png or a pdf
+    with output.stream set"""
+    if name == 'pdf':
+        if settings.get('output', {}).get('stream'):
+            # written as it's drawn, without pyx
+            from .stream_pdf import StreamPdfBackend
+            return StreamPdfBackend()
+        from .pdf import PyxBackend
+        return PyxBackend(settings.get('text', {}).get('engine', 'latex'))
+    if name == 'svg':
+        from .svg import SvgBackend
+        return SvgBackend()
+    if name == 'png':
+        from .raster import RasterBackend
+        return RasterBackend(settings['output'].get('scale', 10))
+    raise ValueError("unknown output format '%s'" % name)
@@ -0,0 +1,47 @@
+"""a backend that just remembers what was drawn, so a diagram can be drawn
+in a worker process and the result sent back and drawn for real later"""
+
+from . import Backend, SHAPES, TEXT
+
+
+class FragmentBackend(Backend):
+    """records every call in order, everything recorded is plain tuples and
+    floats so a fragment pickles cheaply"""
+
+    def __init__(self):
+        self.calls = []
+
+    def bounding_box(self, x, y, width, height):
+        self.calls.append(('bounding_box', (x, y, width, height)))
+
+    def fill_sectors(self, origin, sectors, fill_color, layer=SHAPES):
+        self.calls.append(('fill_sectors',
+                           (tuple(origin), sectors, fill_color, layer)))
+
+    def stroke_lines(self, lines, line_color, width, layer=SHAPES):
+        self.calls.append(('stroke_lines', (lines, line_color, width, layer)))
+
+    def stroke_curves(self, curves, line_color, width, layer=SHAPES):
+        self.calls.append(('stroke_curves', (curves, line_color, width, layer)))
+
+    def fill_circles(self, centres, radius, fill_color, layer=TEXT):
+        self.calls.append(('fill_circles', (centres, radius, fill_color, layer)))
+
+    def prepare_labels(self, labels, text_color):
+        self.calls.append(('prepare_labels', (list(labels), text_color)))
+
+    def draw_label(self, label, x, y, angle, text_color):
+        self.calls.append(('draw_label', (label, x, y, angle, text_color)))
+
+    def replay(self, backend):
+        """draw everything recorded onto another backend, in the same order.
+        returns how many labels the other backend typeset"""
+        typeset = 0
+        for name, args in self.calls:
+            result = getattr(backend, name)(*args)
+            if name == 'prepare_labels':
+                typeset += result or 0
+        return typeset
+
+    def output(self, file_name):
+        raise NotImplementedError('fragments are replayed, not written')
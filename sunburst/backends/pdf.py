@@ -0,0 +1,172 @@
+"""the original pyx backend, writes a pdf and typesets the labels with latex.
+latex is only started the first time a label needs it"""
+
+import threading
+from collections import OrderedDict
+
+from pyx import canvas, path, normpath, style, color, text, trafo, config  #'
+from pyx.font.afmfile import AFMfile  #'
+from pyx.font.font import T1builtinfont  #'
+
+from . import Backend, SHAPES, TEXT
+
+
+# typeset labels, shared between every backend so each distinct label only
+# goes through the text engine once per run. a long running process like the
+# render server keeps using it, so only the most recently used are kept
+LABEL_CACHE = OrderedDict()
+LABEL_CACHE_SIZE = 50000
+# text engines, created the first time they are asked for
+ENGINES = {}
+# the engines and the cache are shared, so only one thread typesets at once
+TYPESET_LOCK = threading.Lock()
+
+# characters that mean something to tex. the typewriter font has all of them
+# at their ascii codes, so they're set by code instead
+TEX_SPECIALS = dict((char, r'{\char%d}' % ord(char))
+                    for char in '\\{}$&#^_%~')
+
+
+def tex_escape(label):
+    """a label that latex sets as it is, like 'a_b' or '\\x00'"""
+    return ''.join(TEX_SPECIALS.get(char, char) for char in label)
+
+
+def text_engine(name):
+    """returns the engine to typeset labels with. 'latex' is a pyx
+    LatexRunner, 'unicode' skips latex altogether and is much faster, good
+    enough for previews"""
+    if name in ENGINES:
+        return ENGINES[name]
+    if name == 'latex':
+        text.set(text.LatexRunner)  #'
+        text.preamble(r"\usepackage{cmtt}")  #'
+        ENGINES[name] = text.defaulttextengine
+    else:
+        # scriptsize at the default 10pt is 7pt
+        try:
+            ENGINES[name] = text.UnicodeEngine(fontname='cmtt10', size=7)
+        except OSError:
+            # cmtt10 comes with tex, without it use Courier, which every
+            # pdf reader has
+            ENGINES[name] = BuiltinFontEngine('Courier', 7)
+    return ENGINES[name]
+
+
+class BuiltinFontEngine(text.UnicodeEngine):
+    """a UnicodeEngine for one of the fonts built into every pdf reader,
+    only their metrics are needed and pyx has those"""
+
+    def __init__(self, fontname, size):
+        with config.open(fontname, [config.format.afm], ascii=True) as afm:
+            self.font = T1builtinfont(fontname, AFMfile(afm))
+        self.size = size
+
+
+class PyxBackend(Backend):
+    """draws onto a pair of pyx canvases, one for shapes and one for text"""
+
+    def __init__(self, engine='latex'):
+        self.canvases = {SHAPES: canvas.canvas(), TEXT: canvas.canvas()}
+        self.engine = engine
+        self.text_size = text.size.scriptsize
+        self.colors = {}
+
+    def color(self, rgb):
+        """the pyx colour for an (r, g, b) tuple"""
+        if rgb not in self.colors:
+            self.colors[rgb] = color.rgb(*rgb)
+        return self.colors[rgb]
+
+    def bounding_box(self, x, y, width, height):
+        self.canvases[SHAPES].stroke(path.rect(x, y, width, height),
+                                     [color.rgb.white, style.linewidth(0.001)])
+
+    def fill_sectors(self, origin, sectors, fill_color, layer=SHAPES):
+        xo, yo = origin
+        subpaths = []
+        for inner_r, outer_r, start_angle, end_angle in sectors:
+            segment = path.path(path.arc(xo, yo, inner_r,
+                                         start_angle, end_angle),
+                                path.arcn(xo, yo, outer_r,
+                                          end_angle, start_angle),
+                                path.closepath())
+            # normpaths keep every sector its own subpath without joining
+            # them up with lines
+            subpaths.extend(segment.normpath().normsubpaths)
+        self.canvases[layer].fill(normpath.normpath(subpaths),
+                                  [self.color(fill_color)])
+
+    def stroke_lines(self, lines, line_color, width, layer=SHAPES):
+        items = []
+        for x0, y0, x1, y1 in lines:
+            items.extend([path.moveto(x0, y0), path.lineto(x1, y1)])
+        self.canvases[layer].stroke(path.path(*items),
+                                    [style.linewidth(width),
+                                     self.color(line_color)])
+
+    def stroke_curves(self, curves, line_color, width, layer=SHAPES):
+        items = []
+        for x0, y0, x1, y1, x2, y2, x3, y3 in curves:
+            items.extend([path.moveto(x0, y0),
+                          path.curveto(x1, y1, x2, y2, x3, y3)])
+        self.canvases[layer].stroke(path.path(*items),
+                                    [style.linewidth(width),
+                                     self.color(line_color)])
+
+    def fill_circles(self, centres, radius, fill_color, layer=TEXT):
+        items = []
+        for x, y in centres:
+            items.extend([path.moveto(x+radius, y),
+                          path.arc(x, y, radius, 0, 360),
+                          path.closepath()])
+        self.canvases[layer].fill(path.path(*items), [self.color(fill_color)])
+
+    def label_key(self, label, text_color):
+        return (self.engine, label, self.text_size, text_color)
+
+    def prepare_labels(self, labels, text_color):
+        """typeset every label that isn't in the cache yet in one batch, the
+        boxes are centred on (0, 0) so they can be placed anywhere"""
+        with TYPESET_LOCK:
+            return self.typeset(labels, text_color)
+
+    def typeset(self, labels, text_color):
+        engine = text_engine(self.engine)
+        typeset = 0
+        for label in labels:
+            key = self.label_key(label, text_color)
+            if key in LABEL_CACHE:
+                LABEL_CACHE.move_to_end(key)
+                continue
+            if self.engine == 'latex':
+                box = engine.text(0, 0, r"\texttt{"+tex_escape(label)+'}',
+                                  [text.halign.center, text.valign.middle,
+                                   self.text_size, self.color(text_color)])
+            else:
+                box = engine.text(0, 0, label, [self.color(text_color)])
+                bbox = box.bbox()
+                # the unicode engine can't align, so centre it by hand
+                box.transform(trafo.translate(
+                    -0.5*(bbox.left() + bbox.right()),
+                    -0.5*(bbox.bottom() + bbox.top())))
+            LABEL_CACHE[key] = box
+            typeset += 1
+            if len(LABEL_CACHE) > LABEL_CACHE_SIZE:
+                LABEL_CACHE.popitem(last=False)
+        return typeset
+
+    def draw_label(self, label, x, y, angle, text_color):
+        key = self.label_key(label, text_color)
+        with TYPESET_LOCK:
+            # typeset again if it was pushed out of the cache since
+            self.typeset([label], text_color)
+            box = LABEL_CACHE[key]
+        self.canvases[TEXT].insert(box, [trafo.rotate(angle).translated(x, y)])
+
+    def output(self, file_name):
+        self.canvases[SHAPES].insert(self.canvases[TEXT])
+        self.canvases[SHAPES].writePDFfile(file_name)  #'
+        if not file_name.endswith('.pdf'):
+            file_name += '.pdf'
+        return file_name
@@ -0,0 +1,193 @@
+"""a pure numpy rasterizer for quick png previews. the sectors of a ring are
+filled in one go, whatever their colours, by working out the polar
+coordinates of every pixel once and looking up which sector each one falls
+in. labels need fonts, so only their dots and leader lines are drawn"""
+
+import struct
+import zlib
+
+import numpy as np
+
+from . import Backend, SHAPES, TEXT
+
+
+# how many curves are sampled at once
+CURVE_CHUNK = 4096
+
+
+class RasterBackend(Backend):
+    """draws into an rgb array, scale is pixels per unit"""
+
+    def __init__(self, scale=10):
+        self.scale = scale
+        self.view = None  # x, y, width, height
+        # everything is drawn when writing, once the size is known
+        self.layers = {SHAPES: [], TEXT: []}
+
+    def bounding_box(self, x, y, width, height):
+        self.view = (x, y, width, height)
+
+    def fill_sectors(self, origin, sectors, fill_color, layer=SHAPES):
+        # the colours of a ring come one after another, they're kept
+        # together so the ring is only filled once
+        records = self.layers[layer]
+        if records and records[-1][0] == self.draw_sectors and \
+                records[-1][1][0] == tuple(origin):
+            records[-1][1][1].append((sectors, fill_color))
+        else:
+            records.append((self.draw_sectors,
+                            (tuple(origin), [(sectors, fill_color)])))
+
+    def stroke_lines(self, lines, line_color, width, layer=SHAPES):
+        # a line is a bezier with its control points on the line
+        curves = [(x0, y0, x0, y0, x1, y1, x1, y1)
+                  for x0, y0, x1, y1 in lines]
+        self.layers[layer].append((self.draw_curves,
+                                   (curves, line_color, width)))
+
+    def stroke_curves(self, curves, line_color, width, layer=SHAPES):
+        self.layers[layer].append((self.draw_curves,
+                                   (curves, line_color, width)))
+
+    def fill_circles(self, centres, radius, fill_color, layer=TEXT):
+        self.layers[layer].append((self.draw_points,
+                                   (np.array(centres, dtype=np.float64),
+                                    fill_color, 2*radius)))
+
+    def draw_label(self, label, x, y, angle, text_color):
+        pass
+
+    def to_pixels(self, x, y):
+        """world coordinates to (column, row)"""
+        vx, vy, _, height = self.view
+        return (x - vx)*self.scale, (vy + height - y)*self.scale
+
+    def draw_sectors(self, origin, batches):
+        """fill batches of (sectors, fill_color), a ring at a time"""
+        sectors = np.array([sector for batch, _ in batches
+                            for sector in batch], dtype=np.float64)
+        if not len(sectors):
+            return
+        colors = np.array([fill_color for _, fill_color in batches])*255
+        color = np.repeat(np.arange(len(batches)),
+                          [len(batch) for batch, _ in batches])
+        # sectors in the same ring never overlap, so within a ring each
+        # pixel's sector can be found with a binary search on start angle
+        rings, ring = np.unique(sectors[:, :2], axis=0, return_inverse=True)
+        ring = ring.ravel()
+        for index, (inner_r, outer_r) in enumerate(rings):
+            rows = np.nonzero(ring == index)[0]
+            rows = rows[np.argsort(sectors[rows, 2], kind='stable')]
+            self.draw_ring(origin, inner_r, outer_r, sectors[rows, 2],
+                           sectors[rows, 3], colors[color[rows]])
+
+    def draw_ring(self, origin, inner_r, outer_r, start, end, fill_colors):
+        """fill the sectors of one ring, sorted by start angle, each with
+        its own colour"""
+        # only look at the pixels that can be covered
+        left, top = self.to_pixels(origin[0] - outer_r, origin[1] + outer_r)
+        right, bottom = self.to_pixels(origin[0] + outer_r,
+                                       origin[1] - outer_r)
+        height, width = self.image.shape[:2]
+        left, top = max(int(left), 0), max(int(top), 0)
+        right, bottom = min(int(right) + 2, width), min(int(bottom) + 2, height)
+        if left >= right or top >= bottom:
+            return
+
+        # polar coordinates of the centre of each pixel
+        vx, vy, _, view_height = self.view
+        columns = np.arange(left, right) + 0.5
+        rows = np.arange(top, bottom) + 0.5
+        dx = columns[np.newaxis, :]/self.scale + vx - origin[0]
+        dy = vy + view_height - rows[:, np.newaxis]/self.scale - origin[1]
+        r = np.hypot(dx, dy)
+        # only the pixels in the ring get an angle and are looked up
+        annulus = (r >= inner_r) & (r < outer_r)
+        dx, dy = np.broadcast_arrays(dx, dy)
+        theta = np.degrees(np.arctan2(dy[annulus], dx[annulus])) % 360.0
+        index = np.searchsorted(start, theta, side='right') - 1
+        inside = (index >= 0) & (theta < end[np.maximum(index, 0)])
+        window = self.image[top:bottom, left:right]
+        pixels = window[annulus]
+        pixels[inside] = fill_colors[index[inside]]
+        window[annulus] = pixels
+
+    def draw_curves(self, curves, line_color, width):
+        curves = np.array(curves, dtype=np.float64)
+        # a chunk at a time so the sample points never get too big
+        for chunk in range(0, len(curves), CURVE_CHUNK):
+            self.draw_curve_chunk(curves[chunk:chunk+CURVE_CHUNK],
+                                  line_color, width)
+
+    def draw_curve_chunk(self, curves, line_color, width):
+        # sample every curve densely enough to leave no gaps
+        x0, y0, x1, y1, x2, y2, x3, y3 = curves.T
+        length = (np.hypot(x1 - x0, y1 - y0) + np.hypot(x2 - x1, y2 - y1) +
+                  np.hypot(x3 - x2, y3 - y2))
+        samples = int(np.ceil(length.max()*self.scale*2)) + 2
+        t = np.linspace(0, 1, samples)[np.newaxis, :]
+        s = 1 - t
+        points_x = (s**3*x0[:, None] + 3*s**2*t*x1[:, None] +
+                    3*s*t**2*x2[:, None] + t**3*x3[:, None])
+        points_y = (s**3*y0[:, None] + 3*s**2*t*y1[:, None] +
+                    3*s*t**2*y2[:, None] + t**3*y3[:, None])
+        points = np.stack([points_x.ravel(), points_y.ravel()], axis=1)
+        self.draw_points(points, line_color, width)
+
+    def draw_points(self, points, point_color, width):
+        """stamp a square of the given width at every point"""
+        if not len(points):
+            return
+        columns, rows = self.to_pixels(points[:, 0], points[:, 1])
+        radius = max(int(width*self.scale/2), 0)
+        height, image_width = self.image.shape[:2]
+        value = np.array(point_color)*255
+        for dy in range(-radius, radius + 1):
+            for dx in range(-radius, radius + 1):
+                x = columns.astype(np.int64) + dx
+                y = rows.astype(np.int64) + dy
+                keep = (x >= 0) & (x < image_width) & (y >= 0) & (y < height)
+                self.image[y[keep], x[keep]] = value
+
+    def render(self):
+        """draw everything recorded, returns the image as a uint8 array"""
+        if self.view is None:
+            raise ValueError('the png backend needs a bounding box')
+        _, _, width, height = self.view
+        # rounded first, so a tile exactly n pixels across doesn't get n+1
+        self.image = np.full((int(np.ceil(round(height*self.scale, 6))),
+                              int(np.ceil(round(width*self.scale, 6))), 3),
+                             255.0)
+        for layer in (SHAPES, TEXT):
+            for draw, args in self.layers[layer]:
+                draw(*args)
+        image = self.image.astype(np.uint8)
+        del self.image
+        return image
+
+    def png(self):
+        """everything drawn, as the bytes of a png"""
+        return png_bytes(self.render())
+
+    def output(self, file_name):
+        with open(file_name+'.png', 'wb') as png:
+            png.write(self.png())
+        return file_name+'.png'
+
+
+def png_bytes(image):
+    """encode an rgb uint8 array as a png"""
+    height, width = image.shape[:2]
+    # every row starts with the filter type, 0 for none
+    raw = np.zeros((height, width*3 + 1), dtype=np.uint8)
+    raw[:, 1:] = image.reshape(height, width*3)
+
+    def chunk(kind, data):
+        return (struct.pack('>I', len(data)) + kind + data +
+                struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff))
+
+    return (b'\x89PNG\r\n\x1a\n' +
+            chunk(b'IHDR', struct.pack('>IIBBBBB', width, height,
+                                       8, 2, 0, 0, 0)) +
+            chunk(b'IDAT', zlib.compress(raw.tobytes(), 6)) +
+            chunk(b'IEND', b''))
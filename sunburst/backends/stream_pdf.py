@@ -0,0 +1,206 @@
+"""a pdf writer that doesn't need pyx or latex, for posters too big to hold
+in memory. like the svg backend every path and label is written out as soon
+as it's drawn, here into a compressed pdf content stream per layer, and the
+streams are copied into the real file at the end. labels are set in Courier,
+one of the fonts every pdf reader has, so nothing is typeset or embedded"""
+
+import shutil
+import tempfile
+import zlib
+from math import sin, cos, tan, pi
+
+from . import Backend, SHAPES, TEXT
+
+
+# points per cm, the units of the config file
+POINTS = 72/2.54
+# scriptsize, 7pt, in cm
+FONT_SIZE = 7/POINTS
+# every Courier glyph is 600/1000 of the font size wide
+CHAR_WIDTH = 0.6*FONT_SIZE
+# how far below the baseline the middle of a lowercase label is
+MIDDLE = 0.25*FONT_SIZE
+# layers in the order they're painted, each one is a content stream
+LAYERS = [SHAPES, TEXT]
+
+
+def pdf_color(rgb):
+    return '%.4f %.4f %.4f' % tuple(rgb)
+
+
+def pdf_string(label):
+    """a label as a pdf string in the font's WinAnsiEncoding"""
+    encoded = label.encode('cp1252', 'replace').decode('latin-1')
+    return '(%s)' % (encoded.replace('\\', '\\\\').replace('(', '\\(')
+                     .replace(')', '\\)'))
+
+
+def arc_to(xo, yo, r, start_angle, end_angle):
+    """pdf path operators for an arc from start_angle to end_angle, from the
+    current point. pdf has no arcs, so it's split into bezier curves of up
+    to 90 degrees each"""
+    commands = []
+    steps = max(1, int((abs(end_angle - start_angle) - 1e-9)//90) + 1)
+    step = (end_angle - start_angle)/steps*pi/180.0
+    # how far the control points are along the tangents
+    handle = 4.0/3.0*tan(step/4.0)*r
+    angle = start_angle*pi/180.0
+    for _ in range(steps):
+        end = angle + step
+        commands.append('%.4f %.4f %.4f %.4f %.4f %.4f c' % (
+            xo + r*cos(angle) - handle*sin(angle),
+            yo + r*sin(angle) + handle*cos(angle),
+            xo + r*cos(end) + handle*sin(end),
+            yo + r*sin(end) - handle*cos(end),
+            xo + r*cos(end), yo + r*sin(end)))
+        angle = end
+    return ' '.join(commands)
+
+
+class ContentStream(object):
+    """a compressed content stream, written to a temporary file as it goes
+    so it never has to fit in memory"""
+
+    def __init__(self):
+        self.file = tempfile.TemporaryFile('w+b')
+        self.compressor = zlib.compressobj()
+        # the colours last set, so they're only set again when they change
+        self.fill = None
+        self.stroke = None
+
+    def write(self, operators):
+        self.file.write(self.compressor.compress(operators.encode('latin-1')))
+
+    def set_fill(self, rgb):
+        if rgb != self.fill:
+            self.write('%s rg\n' % pdf_color(rgb))
+            self.fill = rgb
+
+    def set_stroke(self, rgb, width):
+        if rgb != self.stroke:
+            self.write('%s RG\n' % pdf_color(rgb))
+            self.stroke = rgb
+        # pdf numbers can't have exponents, and thin connectors need the
+        # digits
+        self.write('%.8f w\n' % width)
+
+    def close(self):
+        """finish compressing, returns the length of the stream"""
+        self.file.write(self.compressor.flush())
+        length = self.file.tell()
+        self.file.seek(0)
+        return length
+
+
+class StreamPdfBackend(Backend):
+    """writes a single page pdf, in cm like the config file"""
+
+    def __init__(self):
+        self.layers = dict((layer, ContentStream()) for layer in LAYERS)
+        self.view = None  # x, y, width, height
+
+    def bounding_box(self, x, y, width, height):
+        self.view = (x, y, width, height)
+
+    def fill_sectors(self, origin, sectors, fill_color, layer=SHAPES):
+        xo, yo = origin
+        stream = self.layers[layer]
+        stream.set_fill(fill_color)
+        for inner_r, outer_r, start_angle, end_angle in sectors:
+            start = start_angle*pi/180.0
+            end = end_angle*pi/180.0
+            stream.write('%.4f %.4f m %s %.4f %.4f l %s h\n' % (
+                xo + inner_r*cos(start), yo + inner_r*sin(start),
+                arc_to(xo, yo, inner_r, start_angle, end_angle),
+                xo + outer_r*cos(end), yo + outer_r*sin(end),
+                arc_to(xo, yo, outer_r, end_angle, start_angle)))
+        # every sector is its own subpath, so they're all filled at once
+        stream.write('f\n')
+
+    def stroke_lines(self, lines, line_color, width, layer=SHAPES):
+        stream = self.layers[layer]
+        stream.set_stroke(line_color, width)
+        for x0, y0, x1, y1 in lines:
+            stream.write('%.4f %.4f m %.4f %.4f l\n' % (x0, y0, x1, y1))
+        stream.write('S\n')
+
+    def stroke_curves(self, curves, line_color, width, layer=SHAPES):
+        stream = self.layers[layer]
+        stream.set_stroke(line_color, width)
+        for x0, y0, x1, y1, x2, y2, x3, y3 in curves:
+            stream.write('%.4f %.4f m %.4f %.4f %.4f %.4f %.4f %.4f c\n' % (
+                x0, y0, x1, y1, x2, y2, x3, y3))
+        stream.write('S\n')
+
+    def fill_circles(self, centres, radius, fill_color, layer=TEXT):
+        stream = self.layers[layer]
+        stream.set_fill(fill_color)
+        for x, y in centres:
+            stream.write('%.4f %.4f m %s h\n' % (
+                x + radius, y, arc_to(x, y, radius, 0, 360)))
+        stream.write('f\n')
+
+    def draw_label(self, label, x, y, angle, text_color):
+        stream = self.layers[TEXT]
+        stream.set_fill(text_color)
+        radians = angle*pi/180.0
+        # the text matrix puts the baseline through (x, y) at the angle,
+        # then it's moved back by half the label to centre it
+        stream.write('BT /F1 %.4f Tf %.4f %.4f %.4f %.4f %.4f %.4f Tm '
+                     '%.4f %.4f Td %s Tj ET\n' % (
+                         FONT_SIZE, cos(radians), sin(radians), -sin(radians),
+                         cos(radians), x, y, -0.5*CHAR_WIDTH*len(label),
+                         -MIDDLE, pdf_string(label)))
+
+    def output(self, file_name):
+        x, y, width, height = self.view or (0, 0, 1, 1)
+        if not file_name.endswith('.pdf'):
+            file_name += '.pdf'
+        with open(file_name, 'wb') as pdf:
+            offsets = []
+
+            def start_object():
+                offsets.append(pdf.tell())
+                pdf.write(b'%d 0 obj\n' % len(offsets))
+
+            pdf.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+            start_object()
+            pdf.write(b'<< /Type /Catalog /Pages 2 0 R >>\nendobj\n')
+            start_object()
+            pdf.write(b'<< /Type /Pages /Kids [3 0 R] /Count 1 >>\nendobj\n')
+            start_object()
+            # the first stream sets up cm from the page corner, then the
+            # layers are painted in order
+            contents = ' '.join('%d 0 R' % (5 + index)
+                                for index in range(len(LAYERS) + 1))
+            pdf.write(('<< /Type /Page /Parent 2 0 R '
+                       '/MediaBox [0 0 %.4f %.4f] '
+                       '/Resources << /Font << /F1 4 0 R >> >> '
+                       '/Contents [%s] >>\nendobj\n' % (
+                           width*POINTS, height*POINTS, contents))
+                      .encode('latin-1'))
+            start_object()
+            pdf.write(b'<< /Type /Font /Subtype /Type1 /BaseFont /Courier '
+                      b'/Encoding /WinAnsiEncoding >>\nendobj\n')
+            units = ('q %.6f 0 0 %.6f %.4f %.4f cm\n' % (
+                POINTS, POINTS, -x*POINTS, -y*POINTS)).encode('latin-1')
+            start_object()
+            pdf.write(b'<< /Length %d >>\nstream\n%s\nendstream\nendobj\n'
+                      % (len(units), units))
+            self.layers[LAYERS[-1]].write('Q\n')
+            for layer in LAYERS:
+                stream = self.layers[layer]
+                length = stream.close()
+                start_object()
+                pdf.write(b'<< /Length %d /Filter /FlateDecode >>\nstream\n'
+                          % length)
+                shutil.copyfileobj(stream.file, pdf)
+                pdf.write(b'\nendstream\nendobj\n')
+
+            xref = pdf.tell()
+            pdf.write(b'xref\n0 %d\n0000000000 65535 f \n' % (len(offsets)+1))
+            for offset in offsets:
+                pdf.write(b'%010d 00000 n \n' % offset)
+            pdf.write(b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n'
+                      b'%%%%EOF\n' % (len(offsets) + 1, xref))
+        return file_name
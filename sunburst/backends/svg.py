@@ -0,0 +1,107 @@
+"""a streaming svg writer that doesn't need pyx or latex. elements are
+written to a temporary file per layer as they are drawn, so nothing is kept
+in memory, and the layers are copied into the real file at the end"""
+
+import shutil
+import tempfile
+from math import sin, cos, pi
+from xml.sax.saxutils import escape
+
+from . import Backend, SHAPES, TEXT
+
+
+# scriptsize, 7pt, in cm
+FONT_SIZE = 7/72.0*2.54
+
+
+def svg_color(rgb):
+    return '#%02x%02x%02x' % tuple(int(round(255*c)) for c in rgb)
+
+
+def arc_to(xo, yo, r, start_angle, end_angle):
+    """svg path commands for an arc from start_angle to end_angle, split so
+    no single arc goes past 180 degrees"""
+    commands = []
+    steps = max(1, int((abs(end_angle - start_angle) - 1e-9)//180) + 1)
+    # y is flipped, so counterclockwise is sweep 0
+    sweep = 0 if end_angle > start_angle else 1
+    for step in range(1, steps+1):
+        angle = (start_angle + (end_angle - start_angle)*step/steps)*pi/180.0
+        commands.append('A%.4f %.4f 0 0 %d %.4f %.4f' % (
+            r, r, sweep, xo + r*cos(angle), -(yo + r*sin(angle))))
+    return ' '.join(commands)
+
+
+class SvgBackend(Backend):
+    """writes an svg, with the same units as the config file in cm"""
+
+    def __init__(self):
+        self.layers = {SHAPES: tempfile.TemporaryFile('w+'),
+                       TEXT: tempfile.TemporaryFile('w+')}
+        self.view = None  # x, y, width, height
+
+    def bounding_box(self, x, y, width, height):
+        self.view = (x, y, width, height)
+
+    def fill_sectors(self, origin, sectors, fill_color, layer=SHAPES):
+        xo, yo = origin
+        commands = []
+        for inner_r, outer_r, start_angle, end_angle in sectors:
+            start = start_angle*pi/180.0
+            end = end_angle*pi/180.0
+            commands.append('M%.4f %.4f %s L%.4f %.4f %s Z' % (
+                xo + inner_r*cos(start), -(yo + inner_r*sin(start)),
+                arc_to(xo, yo, inner_r, start_angle, end_angle),
+                xo + outer_r*cos(end), -(yo + outer_r*sin(end)),
+                arc_to(xo, yo, outer_r, end_angle, start_angle)))
+        self.layers[layer].write('<path fill="%s" d="%s"/>\n' % (
+            svg_color(fill_color), ' '.join(commands)))
+
+    def stroke_lines(self, lines, line_color, width, layer=SHAPES):
+        commands = ['M%.4f %.4f L%.4f %.4f' % (x0, -y0, x1, -y1)
+                    for x0, y0, x1, y1 in lines]
+        self.layers[layer].write(
+            '<path fill="none" stroke="%s" stroke-width="%.4g" d="%s"/>\n' % (
+                svg_color(line_color), width, ' '.join(commands)))
+
+    def stroke_curves(self, curves, line_color, width, layer=SHAPES):
+        commands = ['M%.4f %.4f C%.4f %.4f %.4f %.4f %.4f %.4f' % (
+            x0, -y0, x1, -y1, x2, -y2, x3, -y3)
+            for x0, y0, x1, y1, x2, y2, x3, y3 in curves]
+        self.layers[layer].write(
+            '<path fill="none" stroke="%s" stroke-width="%.4g" d="%s"/>\n' % (
+                svg_color(line_color), width, ' '.join(commands)))
+
+    def fill_circles(self, centres, radius, fill_color, layer=TEXT):
+        # two half circle arcs per dot
+        commands = ['M%.4f %.4f a%.4f %.4f 0 1 0 %.4f 0 a%.4f %.4f 0 1 0 '
+                    '%.4f 0' % (x - radius, -y, radius, radius, 2*radius,
+                                radius, radius, -2*radius)
+                    for x, y in centres]
+        self.layers[layer].write('<path fill="%s" d="%s"/>\n' % (
+            svg_color(fill_color), ' '.join(commands)))
+
+    def draw_label(self, label, x, y, angle, text_color):
+        self.layers[TEXT].write(
+            '<text x="%.4f" y="%.4f" transform="rotate(%.4f %.4f %.4f)" '
+            'fill="%s">%s</text>\n' % (x, -y, -angle, x, -y,
+                                       svg_color(text_color), escape(label)))
+
+    def output(self, file_name):
+        x, y, width, height = self.view or (0, 0, 1, 1)
+        with open(file_name+'.svg', 'w') as svg:
+            svg.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+            svg.write('<svg xmlns="http://www.w3.org/2000/svg" '
+                      'width="%.4fcm" height="%.4fcm" '
+                      'viewBox="%.4f %.4f %.4f %.4f">\n' % (
+                          width, height, x, -(y + height), width, height))
+            svg.write('<g>\n')
+            self.layers[SHAPES].seek(0)
+            shutil.copyfileobj(self.layers[SHAPES], svg)
+            svg.write('</g>\n<g font-family="monospace" font-size="%.4f" '
+                      'text-anchor="middle" dominant-baseline="central">\n'
+                      % FONT_SIZE)
+            self.layers[TEXT].seek(0)
+            shutil.copyfileobj(self.layers[TEXT], svg)
+            svg.write('</g>\n</svg>\n')
+        return file_name+'.svg'
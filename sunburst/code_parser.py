@@ -1,39 +1,152 @@
 import os
+from concurrent.futures import ProcessPoolExecutor
+from fnmatch import fnmatch
+from itertools import repeat
 
+from .tokenizer import get_tokenizer
+from .parse_cache import ParseCache
+from .heavy_hitters import SpaceSaving, count_heavy_hitters
 
-def parse_source(source_dir, alphabet, numbers):
-    clean_data = {}
-    source = os.listdir(source_dir)
-    for sourcef in source:
-        # ignore hidden files and __init__
-        if sourcef[0] == '.':
-            continue
-        if sourcef[0] == '_':
-            continue
-        if sourcef.endswith(".py"):
-            cur_source = open(source_dir+'/'+sourcef, 'r')
-            data = cur_source.readlines()
-            for item in PARSE:
-                data = item(data, alphabet, numbers)
-            for entry in data:
-                if entry in clean_data.keys():
-                    clean_data[entry] += data[entry]
-                else:
-                    clean_data[entry] = data[entry]
+
+# how many characters of text to tokenize at once
+BUFFER_SIZE = 1 << 16
+# which files parse_source reads by default, hidden files and directories
+# are skipped along with __init__ and __pycache__
+INCLUDE = ('*.py',)
+EXCLUDE = ('.*', '_*')
+
+
+def find_sources(source_dir, include=INCLUDE, exclude=EXCLUDE):
+    """walk source_dir and return the paths of every file to parse, sorted
+
+    a pattern matches either a file or directory name or its path relative
+    to source_dir. excluded directories aren't searched at all
+
+    """
+    def matches(name, rel_path, patterns):
+        for pattern in patterns:
+            if fnmatch(name, pattern) or fnmatch(rel_path, pattern):
+                return True
+        return False
+
+    sources = []
+    for dirpath, dirnames, filenames in os.walk(source_dir):
+        rel_dir = os.path.relpath(dirpath, source_dir).replace(os.sep, '/')
+        prefix = '' if rel_dir == '.' else rel_dir+'/'
+        dirnames[:] = [name for name in dirnames
+                       if not matches(name, prefix+name, exclude)]
+        for name in filenames:
+            if matches(name, prefix+name, include) and \
+                    not matches(name, prefix+name, exclude):
+                sources.append(os.path.join(dirpath, name))
+    sources.sort()
+    return sources
+
+def parse_file(source_file, alphabet, numbers, max_words=None):
+    """parse a single source file into a {word: freq} dict. max_words is
+    the same as for parse_source, so even one huge file counts in fixed
+    memory"""
+    # the stages are generators, so the file is streamed through them a line
+    # at a time and only the word counts are ever kept
+    with open(source_file, 'r') as cur_source:
+        data = cur_source
+        for item in PARSE[:-1]:
+            data = item(data, alphabet, numbers)
+        if max_words:
+            return count_heavy_hitters(data, max_words)
+        return PARSE[-1](data, alphabet, numbers)
+
+def merge_counts(clean_data, data):
+    """add the counts in data to clean_data"""
+    for entry in data:
+        if entry in clean_data:
+            clean_data[entry] += data[entry]
+        else:
+            clean_data[entry] = data[entry]
     return clean_data
 
-def parse_trace(trace_source, alphabet, numbers):
+def parse_source(source_dir, alphabet, numbers, include=INCLUDE,
+                 exclude=EXCLUDE, processes=None, cache_dir=None,
+                 max_words=None):
+    """parse every matching file under source_dir
+
+    the files are spread over a pool of worker processes which each return
+    the counts for one file, these are merged as they come back. processes
+    defaults to one per core, 1 parses everything in this process. with a
+    cache_dir, only files that changed since the last run are parsed. with
+    max_words, only about that many of the most frequent words are kept and
+    their counts are approximate, see heavy_hitters
+
+    """
+    sources = find_sources(source_dir, include, exclude)
+
+    # each file and the total are both counted in at most max_words words
+    clean_data = SpaceSaving(max_words) if max_words else {}
+    cache = None
+    cached = {}  # index in sources -> counts
+    changed = sources
+    if cache_dir:
+        cache = ParseCache(cache_dir, alphabet, numbers, max_words)
+        for index, source_file in enumerate(sources):
+            data = cache.lookup(source_file)
+            if data is not None:
+                cached[index] = data
+        changed = [source_file for index, source_file in enumerate(sources)
+                   if index not in cached]
+
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = min(processes, len(changed))
+
+    if processes <= 1:
+        parsed = (parse_file(source_file, alphabet, numbers, max_words)
+                  for source_file in changed)
+        merge_parsed(clean_data, sources, cached, parsed, cache)
+    else:
+        chunksize = max(1, len(changed)//(4*processes))
+        with ProcessPoolExecutor(processes) as pool:
+            parsed = pool.map(parse_file, changed,
+                              repeat(alphabet), repeat(numbers),
+                              repeat(max_words), chunksize=chunksize)
+            merge_parsed(clean_data, sources, cached, parsed, cache)
+
+    if cache is not None:
+        cache.save()
+    if max_words:
+        return clean_data.as_dict()
+    return clean_data
+
+def merge_parsed(clean_data, sources, cached, parsed, cache):
+    """merge the counts of every file in the order of sources, so words
+    come out in the same order whichever files were cached. parsed has the
+    counts of the files missing from cached, in order, and they're cached
+    on the way"""
+    parsed = iter(parsed)
+    for index, source_file in enumerate(sources):
+        data = cached.pop(index, None)
+        if data is None:
+            data = next(parsed)
+            if cache is not None:
+                cache.store(source_file, data)
+        merge_counts(clean_data, data)
+
+def parse_trace(trace_source, alphabet, numbers, max_words=None):
+    """trace_source can be any iterable of lines, it is only read once.
+    max_words is the same as for parse_source"""
     clean_data = trace_source
-    for item in PARSE:
+    for item in PARSE[:-1]:
         clean_data = item(clean_data, alphabet, numbers)
-    return clean_data
+    if max_words:
+        return count_heavy_hitters(clean_data, max_words)
+    return PARSE[-1](clean_data, alphabet, numbers)
 
 
 def format_data(clean_data, _, __):
+    """the last stage, the only one that doesn't stream. counts the words"""
     freq_dict = {}
 
     for entry in clean_data:
-        if entry not in freq_dict.keys():
+        if entry not in freq_dict:
             freq_dict[entry] = 1
             continue
         freq_dict[entry] += 1
@@ -41,31 +154,23 @@ def format_data(clean_data, _, __):
     return freq_dict
 
 def remove_indents_and_newline(source, _, __):
-    """take in the raw lines read in from the source filestrip out
+    """take in the raw lines read in from the source file, strip out
     indentation and ending newline characters
 
     arguments:
-        raw_source: the opened source code file
+        source: an iterable of lines, such as the opened source code file
 
     """
-    sanitized = []
     for line in source:
-        while True:
-            # strip out indentation and newline
-            if line[0] == ' ':
-                line = line[1:]
-            else:
-                break
-        if line == '\n':
-            continue
-        else:
-            if len(line)>0:
-                sanitized.append(line[0:-1])
-    return sanitized
+        # strip out indentation and newline
+        line = line.lstrip(' ')
+        if line.endswith('\n'):
+            line = line[0:-1]
+        if line:
+            yield line
 
 def remove_comments(source, _, __):
     """remove inline comments and docstrings"""
-    sanitized = []
     in_string = False
     for line in source:
         save_line = True
@@ -91,50 +196,33 @@ def remove_comments(source, _, __):
                 in_string = False
                 save_line = False
         if save_line and not in_string:
-            sanitized.append(line)
-    return sanitized
+            yield line
 
 def lowercase(source, _, __):
-    sanitized = []
     for line in source:
-        sanitized.append(line.lower())
-    return sanitized
+        yield line.lower()
 
-def split_strings(source, alphabet, numbers):
-    sanitized = []
-    for line in source:
-        temp_line = line
-        cur_word = ''
-        while temp_line:
-            cur_letter = temp_line[0]
-            if cur_letter in alphabet:
-                cur_word += cur_letter
-            elif cur_letter in numbers:
-                if cur_word != '':
-                    cur_word += cur_letter
-            elif cur_word != '':
-                sanitized.append(cur_word)
-                cur_word = ''
-            temp_line = temp_line[1:]
-    return sanitized
-
-def remove_underscores(source, _, __):
-    sanitized = []
+def tokenize(source, alphabet, numbers):
+    """split the lines into words, a buffer of lines at a time"""
+    tokenizer = get_tokenizer(alphabet, numbers)
+    buffer = []
+    buffer_len = 0
     for line in source:
-        temp = []
-        temp = line.split('_')
-        line = ''
-        for item in temp:
-            line += item
-        sanitized.append(line)
-    return sanitized
+        buffer.append(line)
+        buffer_len += len(line)
+        if buffer_len >= BUFFER_SIZE:
+            # lines are kept apart so words never run across them
+            yield from tokenizer.tokenize('\n'.join(buffer))
+            buffer = []
+            buffer_len = 0
+    if buffer:
+        yield from tokenizer.tokenize('\n'.join(buffer))
 
 
 PARSE = [
     remove_indents_and_newline,
     remove_comments,
     lowercase,
-    split_strings,
-    remove_underscores,
+    tokenize,
     format_data,
     ]
@@ -1,5 +1,10 @@
-"""A mapping of letters to colours"""
-from pyx import color
+"""A mapping of letters to colours, every colour is an (r, g, b) tuple"""
+
+# delimiting lines between sectors, and the ones around tiny end sectors
+LINE_COLOR = (0.15, 0.15, 0.15)
+RED = (1.0, 0.0, 0.0)
+# the random floats are me tuning the color just right lol
+TEXT_COLOR = (0, 0.0784*1.4, 0.156*1.4)
 
 
 def color_map(alpha, nums):
@@ -8,13 +13,26 @@ def color_map(alpha, nums):
     mapping = {}
     init = len(alpha)*n
     for letter in alpha:
-        mapping[letter] = color.rgb(init, init, init)
+        mapping[letter] = (init, init, init)
         init -= n
     for number in nums:
-        mapping[number] = color.rgb(0.5, 0.5, 0.5)
-    mapping[''] = color.rgb.red
+        mapping[number] = (0.5, 0.5, 0.5)
+    mapping[''] = RED
+    # siblings too small to draw merged into one sector
+    mapping['...'] = (0.35, 0.35, 0.35)
     return mapping
 
+def palette(mapping, symbols):
+    """the colour of every symbol, in order. symbols that aren't in the
+    mapping, like the parts of a path, get a grey each in the order they're
+    listed"""
+    unknown = [symbol for symbol in symbols if symbol not in mapping]
+    n = 1.0/(len(unknown)+5)
+    shades = dict((symbol, ((len(unknown) - index)*n,)*3)
+                  for index, symbol in enumerate(unknown))
+    return [mapping[symbol] if symbol in mapping else shades[symbol]
+            for symbol in symbols]
+
 #def color_map_2(alpha, nums):
 #    """returns a dict of which color a character maps to"""
 #    n = 1.0/(len(alpha)+5)
@@ -0,0 +1,98 @@
+"""approximate word counts in a fixed amount of memory, for streams with
+more distinct words than are worth keeping. only the frequent words are
+legible in the diagram anyway
+
+uses the SpaceSaving algorithm (Metwally, Agrawal and El Abbadi, 2005): at
+most capacity words are counted, and a new word takes the place of the
+least frequent one, starting from its count. every word with a true count
+above total/capacity is guaranteed to be kept, and no count is ever more
+than total/capacity too high
+
+"""
+
+from heapq import heappush, heapreplace
+
+
+class SpaceSaving(object):
+    """counts of the most frequent words, at most capacity of them
+
+    it can be used like the {word: freq} dicts the parser builds, setting a
+    word that isn't counted yet makes room for it
+
+    """
+
+    def __init__(self, capacity):
+        if capacity < 1:
+            raise ValueError('capacity must be at least 1')
+        self.capacity = capacity
+        self.counts = {}
+        # how much each count could be too high by
+        self.errors = {}
+        # (count, word) with one entry for every word counted. counts only
+        # go up, so an entry can be lower than the real count, it is fixed
+        # when it reaches the top
+        self.heap = []
+        self.total = 0
+
+    def __len__(self):
+        return len(self.counts)
+
+    def __iter__(self):
+        return iter(self.counts)
+
+    def __contains__(self, word):
+        return word in self.counts
+
+    def __getitem__(self, word):
+        return self.counts[word]
+
+    def __setitem__(self, word, count):
+        if word in self.counts:
+            if count < self.counts[word]:
+                raise ValueError('counts can only go up')
+            self.add(word, count - self.counts[word])
+        else:
+            self.add(word, count)
+
+    def add(self, word, amount=1):
+        """count word amount more times"""
+        self.total += amount
+        counts = self.counts
+        if word in counts:
+            counts[word] += amount
+            return
+        if len(counts) < self.capacity:
+            counts[word] = amount
+            self.errors[word] = 0
+            heappush(self.heap, (amount, word))
+            return
+
+        # find the least frequent word, bringing stale entries up to date
+        heap = self.heap
+        while heap[0][0] != counts[heap[0][1]]:
+            heapreplace(heap, (counts[heap[0][1]], heap[0][1]))
+        minimum, victim = heap[0]
+        heapreplace(heap, (minimum + amount, word))
+        del counts[victim]
+        del self.errors[victim]
+        counts[word] = minimum + amount
+        self.errors[word] = minimum
+
+    def update(self, words):
+        """add the counts from a {word: freq} dict"""
+        for word in words:
+            self.add(word, words[word])
+
+    def as_dict(self):
+        """the counts as a plain {word: freq} dict"""
+        return dict(self.counts)
+
+
+def count_heavy_hitters(words, capacity):
+    """the last parse stage when counting approximately, counts a stream of
+    words in at most capacity entries"""
+    counter = SpaceSaving(capacity)
+    add = counter.add
+    for word in words:
+        add(word)
+    return counter.as_dict()
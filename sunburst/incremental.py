@@ -0,0 +1,184 @@
+"""diagrams that can be redrawn after their word counts change, without
+parsing anything again or rebuilding the tree from scratch
+
+    state = DiagramState(settings, (0, 0), words)
+    state.draw(backend)
+    ...
+    state.update({'hello': 2, 'world': -1})
+    state.draw(another_backend)
+
+a change to the counts only touches the nodes along the prefixes of the
+words that changed, new prefixes are appended. the layout is computed again
+with numpy from the updated counts, since a count changing moves every
+sector after it around the ring
+
+"""
+
+import numpy as np
+
+from .layout import FlatTree
+from .pipeline import Pipeline
+from .sequences import SymbolTable, split_sequence
+from .sunburst import Sunburst
+from .stats import NO_STATS
+
+
+class CountTree(object):
+    """the prefix counts of a tree, kept as lists with a row per node in the
+    order the nodes were first seen, so counts can change in place
+
+    it holds the same counts as build_tree, and flat gives the same FlatTree
+    as build_tree would, apart from the order of the rows. the one
+    difference is that siblings with the same count stay in the order they
+    were first seen even if the words that brought them in were removed
+
+    """
+
+    def __init__(self, max_depth=None, separator=''):
+        self.max_depth = max_depth
+        self.separator = separator
+        self.table = SymbolTable()
+        # row 0 is the root
+        self.symbol = [0]
+        self.freq = [0]
+        self.parent = [-1]
+        self.level = [0]
+        # (parent row, symbol id) -> row, an end of word has the id 0
+        self.children = {}
+
+    def __len__(self):
+        return len(self.freq)
+
+    def child(self, row, symbol_id):
+        """the row of a child, created with a count of 0 if it's new"""
+        key = (row, symbol_id)
+        child = self.children.get(key)
+        if child is None:
+            child = self.children[key] = len(self.freq)
+            self.symbol.append(symbol_id)
+            self.freq.append(0)
+            self.parent.append(row)
+            self.level.append(self.level[row] + 1)
+        return child
+
+    def add(self, words):
+        """add a {word: change} dict to the counts, changes can be negative.
+        words are split on the separator like a 'counts' source is"""
+        freq = self.freq
+        max_depth = self.max_depth
+        for word in words:
+            amount = words[word]
+            sequence = word
+            if self.separator:
+                sequence = split_sequence(word, self.separator)
+                if not sequence:
+                    continue
+            freq[0] += amount
+            row = 0
+            level = 0
+            for symbol_id in self.table.encode(sequence):
+                level += 1
+                if max_depth is not None and level > max_depth:
+                    break
+                row = self.child(row, symbol_id)
+                freq[row] += amount
+            else:
+                # the word ended before max_depth, count its end sector
+                level += 1
+                if max_depth is None or level <= max_depth:
+                    row = self.child(row, 0)
+                    freq[row] += amount
+
+    def flat(self):
+        """a FlatTree of every node with a count, the children of each node
+        next to each other, most frequent first"""
+        freq = np.array(self.freq, dtype=np.int64)
+        parent = np.array(self.parent, dtype=np.int64)
+
+        # nodes whose words were all taken away are left out
+        keep = freq > 0
+        keep[0] = True
+        rows = np.nonzero(keep)[0]
+        # ties keep the order the nodes were first seen in, like build_tree
+        order = rows[np.lexsort((rows, -freq[rows], parent[rows]))]
+        position = np.full(len(freq), -1, dtype=np.int64)
+        position[order] = np.arange(len(order))
+
+        sorted_parent = parent[order]
+        new_parent = np.where(sorted_parent >= 0,
+                              position[np.maximum(sorted_parent, 0)], -1)
+        # every node's children are a run in order, since it is sorted by
+        # parent first, so a binary search finds where each run starts
+        first_child = np.searchsorted(sorted_parent, order)
+        n_children = np.bincount(new_parent[1:], minlength=len(order))
+        return FlatTree(list(self.table.symbols),
+                        np.array(self.symbol, dtype=np.int32)[order],
+                        freq[order],
+                        new_parent,
+                        np.array(self.level, dtype=np.int32)[order],
+                        first_child.astype(np.int64),
+                        n_children.astype(np.int64), self.separator)
+
+
+class DiagramState(object):
+    """the counts and layout of one diagram, kept between draws
+
+    arguments:
+        settings: the same settings as generate_diagrams takes
+        origin: (x, y) of the centre of the diagram
+        words: the {word: freq} counts to start with
+        name: what to call the Sunburst objects made by draw
+
+    """
+
+    def __init__(self, settings, origin, words=None, name='diagram'):
+        self.settings = settings
+        self.origin = origin
+        self.name = name
+        self.words = {}
+        # the same depth and separator Pipeline.tree would use for a
+        # 'counts' source, so the rings past data.prefix are all there
+        data = settings['data']
+        separator = data.get('separator') or ''
+        prefix = Pipeline().prefix(data, separator)
+        self.counts = CountTree(len(prefix) + data['max_recursion'],
+                                separator)
+        self.layout = None
+        if words:
+            self.update(words)
+
+    def update(self, delta):
+        """add a {word: change} dict of new counts, a word whose count drops
+        to 0 is removed. returns the words that changed"""
+        changed = {}
+        for word in delta:
+            amount = delta[word]
+            if not amount:
+                continue
+            count = self.words.get(word, 0) + amount
+            if count < 0:
+                raise ValueError("'%s' would have a count below 0" % word)
+            changed[word] = amount
+        self.counts.add(changed)
+        for word in changed:
+            count = self.words.get(word, 0) + changed[word]
+            if count:
+                self.words[word] = count
+            else:
+                del self.words[word]
+        if changed:
+            self.layout = None
+        return changed
+
+    def draw(self, backend, stats=NO_STATS):
+        """draw the diagram as it is now onto backend, the layout is only
+        worked out again if the counts changed since the last draw"""
+        diagram = Sunburst(backend, self.settings, None, self.name,
+                           self.origin, ('counts', self.words), stats)
+        diagram.import_settings()
+        if self.layout is None:
+            with stats.stage('layout'):
+                tree = self.counts.flat()
+            self.layout = diagram.lay_out(tree)
+        diagram.draw_layout(self.layout)
+        return diagram
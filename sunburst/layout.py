@@ -0,0 +1,359 @@
+"""lay out the whole diagram before anything gets drawn. the prefix tree
+is kept as arrays, then every sector's angles, radii, delimiters and
+bezier control points are calculated a ring at a time with numpy, giving a
+table that any renderer can consume"""
+
+import numpy as np
+
+
+class FlatTree(object):
+    """a prefix tree as arrays, breadth first, see sequences.build_tree. row
+    0 is the root, and the children of every node sit next to each other,
+    sorted by frequency"""
+
+    def __init__(self, symbols, symbol, freq, parent, level, first_child,
+                 n_children, separator=''):
+        self.symbols = symbols  # symbol id -> letter, '' marks an end
+        # goes between the symbols when a whole word is spelled out
+        self.separator = separator
+        self.symbol_ids = None
+        self.symbol = symbol
+        self.freq = freq
+        self.parent = parent
+        self.level = level
+        self.first_child = first_child
+        self.n_children = n_children
+
+    def __len__(self):
+        return len(self.freq)
+
+    def word(self, node):
+        """rebuild the prefix that leads to a node"""
+        letters = []
+        while node > 0:
+            # the end marker is '', it only matters between the symbols
+            if self.symbol[node]:
+                letters.append(str(self.symbols[self.symbol[node]]))
+            node = self.parent[node]
+        return self.separator.join(reversed(letters))
+
+    def symbol_id(self, letter):
+        """the id of a symbol, or None if it isn't in the tree"""
+        if self.symbol_ids is None:
+            self.symbol_ids = dict((symbol, index) for index, symbol
+                                   in enumerate(self.symbols))
+        return self.symbol_ids.get(letter)
+
+    def find_prefix(self, prefix):
+        """the node that prefix leads to, or None if no word starts with it"""
+        node = 0
+        for letter in prefix:
+            symbol = self.symbol_id(letter)
+            if symbol is None:
+                return None
+            first = self.first_child[node]
+            children = self.symbol[first:first + self.n_children[node]]
+            match = np.nonzero(children == symbol)[0]
+            if not len(match):
+                return None
+            node = int(first + match[0])
+        return node
+
+
+# the symbol id and label given to sectors that aggregate tiny siblings
+OTHER = -1
+OTHER_LABEL = '...'
+
+
+class Layout(object):
+    """a table with one row per sector, every column is an array
+
+    rows are ordered by ring, and within a ring by angle. angles are in
+    degrees, except the centroids which are in radians like the rest of the
+    drawing code expects. rows that merge siblings too small to print have
+    other set, no node and the symbol OTHER
+
+    """
+
+    def __init__(self, tree, columns):
+        self.tree = tree
+        for name in columns:
+            setattr(self, name, columns[name])
+
+    def __len__(self):
+        return len(self.node)
+
+    def take(self, rows):
+        """a Layout of just the given rows, in the order given. parent still
+        refers to rows of the full layout"""
+        columns = dict((name, value[rows]) for name, value in
+                       vars(self).items() if name != 'tree')
+        return Layout(self.tree, columns)
+
+    def rings(self):
+        """a slice of the rows of each ring, innermost first"""
+        edges = np.nonzero(np.diff(self.level))[0] + 1
+        bounds = [0] + edges.tolist() + [len(self)]
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            if stop > start:
+                yield slice(start, stop)
+
+    def label(self, row):
+        """the text for a sector, end sectors spell out the whole word"""
+        if self.other[row]:
+            return OTHER_LABEL
+        node = self.node[row]
+        if self.end[row]:
+            return self.tree.word(node)
+        letters = [str(self.tree.symbols[self.tree.symbol[node]])]
+        # a collapsed chain spells out every letter down it
+        for _ in range(int(self.span[row]) - 1):
+            node = self.tree.first_child[node]
+            letters.append(str(self.tree.symbols[self.tree.symbol[node]]))
+        return self.tree.separator.join(letters)
+
+
+def compute_layout(tree, origin, layer_width, sector_width, max_level,
+                   min_arc=0, min_label=0, root=0, radix=False):
+    """lay out every sector under the root of a FlatTree, or under another
+    node as if it was the root
+
+    arguments:
+        tree: the FlatTree to lay out
+        origin: (x, y) of the centre of the diagram
+        layer_width: distance between the inner edges of two rings
+        sector_width: radial thickness of a sector
+        max_level: the deepest ring to lay out
+        min_arc: siblings with a shorter arc than this are merged into one
+            other sector, and nothing under them is laid out
+        min_label: sectors with a shorter arc than this aren't labelled
+        root: the node to put in the centre, its children make the first
+            ring, find_prefix gives the node for a prefix
+        radix: collapse every chain of only children into one sector that
+            spans all their rings, labelled with all their letters
+
+    """
+    # the root takes up the whole circle and is never drawn
+    frontier = np.full(1, root, dtype=np.int64)
+    frontier_rows = np.full(1, -1, dtype=np.int64)
+    frontier_start = np.zeros(1)
+    frontier_end = np.full(1, 360.0)
+
+    columns = {'node': [], 'symbol': [], 'freq': [], 'parent': [],
+               'level': [], 'start': [], 'end': [], 'other': []}
+    n_rows = 0
+    level = 0
+    while len(frontier) and level < max_level:
+        level += 1
+        counts = tree.n_children[frontier]
+        # end sectors and truncated nodes have no children
+        keep = counts > 0
+        frontier, frontier_rows = frontier[keep], frontier_rows[keep]
+        frontier_start, frontier_end = frontier_start[keep], frontier_end[keep]
+        counts = counts[keep]
+        if not len(frontier):
+            break
+
+        # gather every child of the frontier, group says whose child it is
+        total = counts.sum()
+        group_start = np.cumsum(counts) - counts
+        group = np.repeat(np.arange(len(frontier)), counts)
+        child = (tree.first_child[frontier][group] +
+                 np.arange(total) - group_start[group])
+
+        # split each parent's arc proportionally to the child frequencies
+        freq = tree.freq[child]
+        weight = freq.astype(np.float64)
+        cumulative = np.cumsum(weight)
+        before = cumulative - weight
+        before -= before[group_start][group]
+        group_total = np.add.reduceat(weight, group_start)[group]
+        arc = (frontier_end - frontier_start)[group]
+        start = frontier_start[group] + arc*before/group_total
+        end = frontier_start[group] + arc*(before + weight)/group_total
+        symbol = tree.symbol[child]
+        other = np.zeros(total, dtype=bool)
+
+        if min_arc > 0:
+            arc_length = (end - start)*np.pi/180.0*(
+                level*layer_width + 0.5*sector_width)
+            small = arc_length < min_arc
+            if small.any():
+                (child, symbol, freq, group, start, end,
+                 other) = merge_small(small, child, symbol, freq, group,
+                                      start, end, frontier_end)
+                total = len(child)
+
+        columns['node'].append(child)
+        columns['symbol'].append(symbol)
+        columns['freq'].append(freq)
+        columns['parent'].append(frontier_rows[group])
+        columns['level'].append(np.full(total, level, dtype=np.int32))
+        columns['start'].append(start)
+        columns['end'].append(end)
+        columns['other'].append(other)
+
+        # other sectors are never expanded
+        expand = ~other
+        frontier = child[expand]
+        frontier_rows = np.arange(n_rows, n_rows + total)[expand]
+        frontier_start, frontier_end = start[expand], end[expand]
+        n_rows += total
+
+    for name in columns:
+        if columns[name]:
+            columns[name] = np.concatenate(columns[name])
+        else:
+            columns[name] = np.zeros(0)
+    columns['node'] = columns['node'].astype(np.int64)
+    columns['parent'] = columns['parent'].astype(np.int64)
+    columns['symbol'] = columns['symbol'].astype(np.int32)
+    columns['level'] = columns['level'].astype(np.int32)
+    columns['other'] = columns['other'].astype(bool)
+    columns['span'] = np.ones(len(columns['node']), dtype=np.int32)
+    if radix:
+        columns = collapse_chains(columns)
+
+    return Layout(tree, geometry(columns, origin, layer_width, sector_width,
+                                 min_label))
+
+
+def merge_small(small, child, symbol, freq, group, start, end, parent_end):
+    """replace the small children of every parent with one other sector
+    covering all of them. children are sorted by frequency, so the small
+    ones are always the tail of their group"""
+    index = np.arange(len(child))
+    first_small = np.full(len(parent_end), len(child))
+    np.minimum.at(first_small, group[small], index[small])
+    other_group = np.nonzero(first_small < len(child))[0]
+    other_freq = np.bincount(group[small], weights=freq[small],
+                             minlength=len(parent_end))[other_group]
+
+    n_other = len(other_group)
+    big = ~small
+    merged = (
+        np.concatenate([child[big], np.full(n_other, -1)]),
+        np.concatenate([symbol[big], np.full(n_other, OTHER)]),
+        np.concatenate([freq[big], other_freq.astype(freq.dtype)]),
+        np.concatenate([group[big], other_group]),
+        np.concatenate([start[big], start[first_small[other_group]]]),
+        np.concatenate([end[big], parent_end[other_group]]),
+        np.concatenate([np.zeros(big.sum(), dtype=bool),
+                        np.ones(n_other, dtype=bool)]))
+    # put each other sector back at the end of its parent's children
+    order = np.argsort(2*merged[3] + merged[6], kind='stable')
+    return tuple(column[order] for column in merged)
+
+
+def collapse_chains(columns):
+    """fold every sector that is the only child of its parent into the
+    parent, so a chain of them is one row whose span is the number of rings
+    it covers. end and other sectors are never folded, they look different"""
+    parent = columns['parent']
+    level = columns['level']
+    plain = ~columns['other'] & (columns['symbol'] != 0)
+    has_parent = parent >= 0
+    n_children = np.bincount(parent[has_parent], minlength=len(parent))
+    folded = has_parent & plain
+    folded[folded] = (n_children[parent[folded]] == 1) & plain[parent[folded]]
+    if not folded.any():
+        return columns
+
+    # the row at the top of each chain, a ring at a time since rows are in
+    # ring order and a parent's head is known before its children's
+    head = np.arange(len(parent))
+    for ring in range(int(level.min()), int(level.max()) + 1):
+        rows = np.nonzero(folded & (level == ring))[0]
+        head[rows] = head[parent[rows]]
+    span = np.ones(len(parent), dtype=np.int32)
+    np.maximum.at(span, head[folded], level[folded] - level[head[folded]] + 1)
+
+    keep = ~folded
+    position = np.cumsum(keep) - 1
+    collapsed = dict((name, column[keep]) for name, column in columns.items())
+    # children below a chain hang off its head
+    kept_parent = parent[keep]
+    collapsed['parent'] = np.where(
+        kept_parent >= 0, position[head[np.maximum(kept_parent, 0)]], -1)
+    collapsed['span'] = span[keep]
+    return collapsed
+
+
+def geometry(columns, origin, layer_width, sector_width, min_label):
+    """work out all the trig for the sectors in one go"""
+    xo, yo = origin
+    parent = columns['parent']
+    level = columns['level']
+    start = columns['start']
+    end = columns['end']
+    is_end = columns['symbol'] == 0
+    span = columns['span']
+
+    inner_r = level*layer_width
+    # collapsed chains stretch over the rings of the sectors folded in
+    outer_r = inner_r + (span - 1)*layer_width + sector_width
+    centroid = 0.5*(start + end)*np.pi/180.0
+    centroid_r = 0.5*(inner_r + outer_r)
+    start_radians = start*np.pi/180.0
+    end_radians = end*np.pi/180.0
+    arc_length = (end - start)*np.pi/180.0*centroid_r
+
+    # the root sits at pi, since it spans the full circle
+    has_parent = parent >= 0
+    parent_centroid = np.where(has_parent, centroid[parent], np.pi)
+    parent_outer_r = (level - 1)*layer_width + sector_width
+
+    # end sectors, other sectors and chains put their label in the middle
+    # of the sector, the rest a little further out
+    label_r = np.where(is_end | columns['other'] | (span > 1), centroid_r,
+                       centroid_r + 0.25*sector_width)
+
+    # the bezier runs from this sector back to its parent, level 1 sectors
+    # don't get one since there is nothing to connect them to
+    delta = 0.1*(centroid - parent_centroid)
+    bezier = np.stack([
+        (inner_r + 0.05)*np.cos(centroid) + xo,
+        (inner_r + 0.05)*np.sin(centroid) + yo,
+        parent_outer_r*np.cos(centroid) + xo,
+        parent_outer_r*np.sin(centroid) + yo,
+        inner_r*np.cos(parent_centroid + delta) + xo,
+        inner_r*np.sin(parent_centroid + delta) + yo,
+        parent_outer_r*np.cos(parent_centroid + delta) + xo,
+        parent_outer_r*np.sin(parent_centroid + delta) + yo], axis=1)
+    bezier_width = 0.05*(end - start)*inner_r*np.pi/180.0
+
+    return {
+        'node': columns['node'],
+        'parent': parent,
+        'level': level,
+        'symbol': columns['symbol'],
+        'freq': columns['freq'],
+        'end': is_end,
+        'other': columns['other'],
+        'span': span,
+        'start_angle': start,
+        'end_angle': end,
+        'inner_r': inner_r,
+        'outer_r': outer_r,
+        'arc_length': arc_length,
+        'centroid': centroid,
+        'centroid_r': centroid_r,
+        'centroid_x': centroid_r*np.cos(centroid) + xo,
+        'centroid_y': centroid_r*np.sin(centroid) + yo,
+        'labelled': arc_length >= min_label,
+        'label_r': label_r,
+        'label_x': label_r*np.cos(centroid) + xo,
+        'label_y': label_r*np.sin(centroid) + yo,
+        # delimiting lines along the start and end edges, inner to outer
+        'start_line': np.stack([inner_r*np.cos(start_radians) + xo,
+                                inner_r*np.sin(start_radians) + yo,
+                                outer_r*np.cos(start_radians) + xo,
+                                outer_r*np.sin(start_radians) + yo], axis=1),
+        'end_line': np.stack([inner_r*np.cos(end_radians) + xo,
+                              inner_r*np.sin(end_radians) + yo,
+                              outer_r*np.cos(end_radians) + xo,
+                              outer_r*np.sin(end_radians) + yo], axis=1),
+        'has_bezier': has_parent,
+        'bezier': bezier,
+        'bezier_width': bezier_width,
+    }
@@ -0,0 +1,99 @@
+"""an on-disk cache of the word counts for every parsed source file, so
+reruns only have to parse the files that changed
+
+the counts are stored in objects/<key>.json, where the key is a hash of the
+file contents and the parser settings. an index per settings remembers the
+mtime and size each file had when it was last hashed, so unchanged files
+don't even need to be read
+
+"""
+
+import hashlib
+import json
+import os
+
+
+# bump this whenever the parser changes what it counts
+VERSION = 1
+
+
+class ParseCache(object):
+    """cached {word: freq} dicts for source files"""
+
+    def __init__(self, cache_dir, alphabet, numbers, max_words=None):
+        self.cache_dir = cache_dir
+        self.object_dir = os.path.join(cache_dir, 'objects')
+        os.makedirs(self.object_dir, exist_ok=True)
+        settings = (VERSION, alphabet, numbers)
+        if max_words:
+            # approximate counts are kept apart from exact ones
+            settings += (max_words,)
+        self.settings_key = hashlib.sha1(
+            repr(settings).encode('utf-8')).hexdigest()
+        self.index_file = os.path.join(cache_dir,
+                                       'index-'+self.settings_key+'.json')
+        try:
+            with open(self.index_file, 'r') as index:
+                self.index = json.load(index)
+        except (OSError, ValueError):
+            self.index = {}
+        # files looked up this run
+        self.new_index = {}
+        # files that missed, waiting for their counts to be stored
+        self.pending = {}
+
+    def object_file(self, key):
+        return os.path.join(self.object_dir, key+'.json')
+
+    def load(self, key):
+        try:
+            with open(self.object_file(key), 'r') as counts:
+                return json.load(counts)
+        except (OSError, ValueError):
+            return None
+
+    def lookup(self, source_file):
+        """returns the cached counts for a file, or None if it needs parsing"""
+        path = os.path.abspath(source_file)
+        stat = os.stat(path)
+        entry = self.index.get(path)
+        if entry and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+            data = self.load(entry[2])
+            if data is not None:
+                self.new_index[path] = entry
+                return data
+
+        # the file looks different, but the contents may not have changed
+        digest = hashlib.sha1(self.settings_key.encode('utf-8'))
+        with open(path, 'rb') as source:
+            for block in iter(lambda: source.read(1 << 20), b''):
+                digest.update(block)
+        entry = [stat.st_mtime_ns, stat.st_size, digest.hexdigest()]
+        data = self.load(entry[2])
+        if data is not None:
+            self.new_index[path] = entry
+            return data
+        self.pending[path] = entry
+        return None
+
+    def store(self, source_file, data):
+        """save the counts for a file that missed in lookup"""
+        path = os.path.abspath(source_file)
+        entry = self.pending.pop(path)
+        write_json(self.object_file(entry[2]), data)
+        self.new_index[path] = entry
+
+    def save(self):
+        """write the index out with the entries for this run's files. other
+        entries are kept, so source trees can share a cache_dir"""
+        self.index.update(self.new_index)
+        write_json(self.index_file, self.index)
+        self.new_index = {}
+
+
+def write_json(file_name, data):
+    """write data so that a crash never leaves half a file behind"""
+    temp_name = '%s.%d.tmp' % (file_name, os.getpid())
+    with open(temp_name, 'w') as temp:
+        json.dump(data, temp)
+    os.replace(temp_name, file_name)
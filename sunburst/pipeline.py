@@ -0,0 +1,167 @@
+"""the stages that turn a data source into a laid out diagram, remembered
+so diagrams drawn from the same data in one run share the work
+
+    words   ingest, tokenize and count, a {word: freq} dict. the lines are
+            streamed through the tokenizer into the counts, so there is
+            nothing in between worth keeping
+    tree    the prefix tree of the words as a FlatTree
+    layout  every sector's geometry, for one origin and set of layer settings
+
+each stage is remembered by everything it depends on. two diagrams of the
+same source with different origins only parse and count once, and one with
+a smaller max_recursion reuses the deeper tree of the other
+
+"""
+
+from .code_parser import parse_source, parse_trace, INCLUDE, EXCLUDE
+from .colormap import color_map
+from .layout import compute_layout
+from .sequences import build_tree, count_sequences, split_counts
+from .stats import NO_STATS
+from .treefile import load_tree_file
+
+
+# sources whose words are split on data.separator, code is always words
+SEPARATED = ('sequences', 'counts')
+
+
+class NoWords(ValueError):
+    """no words start with data.prefix, so there is nothing to draw"""
+
+
+class Pipeline(object):
+    """remembers the result of every stage for the life of the object, so
+    use one per run. generate_diagrams makes one for all its diagrams"""
+
+    def __init__(self, stats=NO_STATS):
+        self.stats = stats
+        self.memo = {}
+
+    def remember(self, key, compute):
+        """the result for key, computed the first time it's asked for"""
+        if key in self.memo:
+            self.stats.count('reused_'+key[0])
+            return self.memo[key]
+        value = self.memo[key] = compute()
+        return value
+
+    def words_key(self, data_source, data, source_dir):
+        """what the counts of a data source depend on"""
+        kind = data_source[0]
+        if kind == 'raw':
+            return ('words', 'raw', source_dir, data['alphabet'],
+                    data['numbers'], tuple(data.get('include', INCLUDE)),
+                    tuple(data.get('exclude', EXCLUDE)),
+                    data.get('max_words'))
+        # the others can only be told apart by which object they are,
+        # they're kept in the memo with the result so the id isn't reused
+        return ('words', kind, id(data_source[1]), data['alphabet'],
+                data['numbers'], data.get('max_words'),
+                data.get('separator'))
+
+    def words(self, data_source, data, source_dir):
+        """the {word: freq} counts of a 'raw', 'trace', 'sequences' or
+        'counts' source. the words of sequences and counts can be any
+        sequence, see sunburst.sequences"""
+        def count():
+            with self.stats.stage('parse'):
+                if data_source[0] == 'raw':
+                    words = parse_source(source_dir, data['alphabet'],
+                                         data['numbers'],
+                                         data.get('include', INCLUDE),
+                                         data.get('exclude', EXCLUDE),
+                                         data.get('processes'),
+                                         data.get('cache_dir'),
+                                         data.get('max_words'))
+                elif data_source[0] == 'trace':
+                    words = parse_trace(data_source[1], data['alphabet'],
+                                        data['numbers'],
+                                        data.get('max_words'))
+                elif data_source[0] == 'sequences':
+                    # any iterable of sequences, lines of text are split on
+                    # data.separator
+                    words = count_sequences(data_source[1],
+                                            data.get('separator'))
+                elif data_source[0] == 'counts':
+                    # a {word: freq} dict that was counted already, its
+                    # string words are split on data.separator too
+                    words = split_counts(data_source[1],
+                                         data.get('separator'))
+                else:
+                    raise ValueError("unknown data source '%s'"
+                                     % data_source[0])
+            self.stats.count('distinct_words', len(words))
+            return data_source[1:], words
+        return self.remember(self.words_key(data_source, data, source_dir),
+                             count)[1]
+
+    def tree(self, data_source, data, source_dir):
+        """the FlatTree to lay out, deep enough for data.max_recursion rings
+        past data.prefix"""
+        if data_source[0] == 'file':
+            # a file from treefile has the tree ready to lay out
+            def load():
+                with self.stats.stage('parse'):
+                    saved = load_tree_file(data_source[1])
+                self.stats.count('distinct_words', len(saved.words))
+                return saved
+            return self.remember(('file', data_source[1]), load).tree
+
+        words_key = self.words_key(data_source, data, source_dir)
+        separator = ''
+        if data_source[0] in SEPARATED:
+            separator = data.get('separator') or ''
+        prefix = self.prefix(data, separator)
+        depth = len(prefix) + data['max_recursion']
+        key = ('tree', words_key, prefix, separator)
+        if key in self.memo and self.memo[key][0] >= depth:
+            self.stats.count('reused_tree')
+            return self.memo[key][1]
+
+        words = self.words(data_source, data, source_dir)
+        # count every prefix once, only as deep as we will draw
+        with self.stats.stage('count'):
+            if prefix:
+                # zoomed in, only the words under the prefix are drawn but
+                # they go max_recursion rings past it
+                words = dict((word, words[word]) for word in words
+                             if word[:len(prefix)] == prefix)
+            tree = build_tree(words, depth, separator)
+        self.stats.count('sectors_created', len(tree) - 1)
+        self.memo[key] = (depth, tree)
+        return tree
+
+    def layout(self, tree, origin, layer, data):
+        """lay out a FlatTree, with the node for data.prefix in the centre"""
+        prefix = self.prefix(data, tree.separator)
+        key = ('layout', id(tree), tuple(origin), layer['layer_width'],
+               layer['sector_width'], data['max_recursion'],
+               layer.get('min_arc', 0), layer.get('min_label', 0), prefix,
+               bool(layer.get('radix')))
+
+        def lay_out():
+            root = tree.find_prefix(prefix)
+            if root is None:
+                raise NoWords("no words start with '%s'" % data['prefix'])
+            with self.stats.stage('layout'):
+                layout = compute_layout(tree, origin,
+                                        layer['layer_width'],
+                                        layer['sector_width'],
+                                        data['max_recursion'],
+                                        layer.get('min_arc', 0),
+                                        layer.get('min_label', 0),
+                                        root, bool(layer.get('radix')))
+            return layout
+        # the tree goes in the memo too, so its id stays unique
+        return self.remember(key, lambda: (tree, lay_out()))[1]
+
+    def prefix(self, data, separator):
+        """data.prefix as a sequence of symbols, split on separator"""
+        prefix = data.get('prefix') or ''
+        if separator:
+            return tuple(part for part in prefix.split(separator) if part)
+        return prefix
+
+    def color_map(self, alphabet, numbers):
+        return self.remember(('color_map', alphabet, numbers),
+                             lambda: color_map(alphabet, numbers))
@@ -0,0 +1,190 @@
+"""diagrams of any kind of sequence, not just words: file paths split on
+'/', call stacks, url segments, byte strings or full unicode
+
+a sequence is a string, whose symbols are its characters, a byte string,
+whose bytes are shown as their latin-1 characters, or a tuple of anything
+hashable. every distinct symbol is interned as an integer id, and
+the prefix tree is counted with numpy a level at a time, so nothing is
+looked up by its symbol past the interning
+
+    counts = count_sequences(open('paths.txt'), '/')
+    tree = build_tree(counts, max_depth=10, separator='/')
+
+"""
+
+import numpy as np
+
+from .layout import FlatTree
+
+
+def byte_symbol(byte):
+    """the symbol for a byte of a byte string, its latin-1 character or an
+    escape if that can't be printed"""
+    char = chr(byte)
+    return char if char.isprintable() else '\\x%02x' % byte
+
+
+BYTE_SYMBOLS = [byte_symbol(byte) for byte in range(256)]
+
+
+class SymbolTable(object):
+    """gives every distinct symbol an integer id, id 0 is '' which marks the
+    end of a sequence"""
+
+    def __init__(self):
+        self.symbols = ['']
+        self.ids = {'': 0}
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def intern(self, symbol):
+        symbol_id = self.ids.get(symbol)
+        if symbol_id is None:
+            symbol_id = self.ids[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+        return symbol_id
+
+    def encode(self, sequence):
+        """the ids of every symbol in a sequence, new symbols are added"""
+        if isinstance(sequence, (bytes, bytearray)):
+            # bytes come out of a byte string as ints, which would be
+            # labelled as numbers
+            sequence = [BYTE_SYMBOLS[byte] for byte in sequence]
+        ids = self.ids
+        encoded = [ids.get(symbol) for symbol in sequence]
+        if None in encoded:
+            encoded = [self.intern(symbol) for symbol in sequence]
+        return encoded
+
+
+def split_sequence(item, separator=None):
+    """a line of input as a sequence. with a separator strings are split on
+    it, empty parts and surrounding whitespace dropped, so '/usr/lib/' is
+    ('usr', 'lib')"""
+    if isinstance(item, str):
+        item = item.strip()
+        if separator:
+            return tuple(part for part in item.split(separator) if part)
+        return item
+    if isinstance(item, (bytes, bytearray)):
+        return bytes(item)
+    return tuple(item)
+
+
+def count_sequences(items, separator=None):
+    """a {sequence: count} dict from any iterable of sequences, split by
+    split_sequence. empty ones aren't counted"""
+    counts = {}
+    for item in items:
+        sequence = split_sequence(item, separator)
+        if sequence:
+            counts[sequence] = counts.get(sequence, 0) + 1
+    return counts
+
+
+def split_counts(counts, separator=None):
+    """a {word: freq} dict that was counted already as a {sequence: freq}
+    dict, the words split like split_sequence does. words that split the
+    same are added together"""
+    if not separator:
+        return counts
+    split = {}
+    for word in counts:
+        sequence = split_sequence(word, separator)
+        if sequence:
+            split[sequence] = split.get(sequence, 0) + counts[word]
+    return split
+
+
+def build_tree(sequences, max_depth=None, separator='', table=None):
+    """the prefix tree of a {sequence: freq} dict as a FlatTree. every node
+    counts all the sequences that pass through it, and the children of each
+    node are sorted by frequency, ties in the order they were first seen
+
+    arguments:
+        sequences: the counts, keys can be strings, bytes or tuples
+        max_depth: the deepest level that will ever be drawn, nodes below it
+            are never created
+        separator: put between the symbols of a sequence to label its end
+            sector
+        table: a SymbolTable to intern the symbols in, a new one if None
+
+    """
+    if table is None:
+        table = SymbolTable()
+    # every sequence's symbol ids back to back, cut at max_depth
+    ids = []
+    lengths = []
+    freqs = []
+    for sequence in sequences:
+        encoded = table.encode(sequence)
+        if max_depth is not None:
+            encoded = encoded[:max_depth]
+        ids.extend(encoded)
+        lengths.append(len(encoded))
+        freqs.append(sequences[sequence])
+    ids = np.array(ids, dtype=np.int64)
+    lengths = np.array(lengths, dtype=np.int64)
+    freqs = np.array(freqs, dtype=np.int64)
+    starts = np.cumsum(lengths) - lengths
+    # a sequence cut short never gets an end sector
+    ends = np.ones(len(lengths), dtype=bool)
+    if max_depth is not None:
+        ends = np.array([len(sequence) for sequence in sequences],
+                        dtype=np.int64) < max_depth
+
+    symbol = [np.zeros(1, dtype=np.int64)]
+    freq = [np.full(1, freqs.sum(), dtype=np.int64)]
+    parent = [np.full(1, -1, dtype=np.int64)]
+    level_counts = [1]
+    n_symbols = len(table)
+
+    # the row of the node each sequence has reached, all start at the root
+    sequence = np.arange(len(lengths))
+    node = np.zeros(len(lengths), dtype=np.int64)
+    n_rows = 1
+    level = 0
+    while len(sequence) and (max_depth is None or level < max_depth):
+        # sequences with a symbol here go on, ones that just ended get an
+        # end sector
+        going = lengths[sequence] > level
+        ending = ~going & ends[sequence]
+        here = going | ending
+        sequence, node, going = sequence[here], node[here], going[here]
+        if not len(sequence):
+            break
+        letter = np.zeros(len(sequence), dtype=np.int64)
+        letter[going] = ids[starts[sequence[going]] + level]
+        # each distinct (parent, symbol) is a child, first_seen is the
+        # first sequence to reach it, which breaks ties
+        key = node*n_symbols + letter
+        unique, first_seen, inverse = np.unique(key, return_index=True,
+                                                return_inverse=True)
+        child_freq = np.bincount(inverse, weights=freqs[sequence])
+        child_freq = np.rint(child_freq).astype(np.int64)
+        child_parent = unique//n_symbols
+        order = np.lexsort((first_seen, -child_freq, child_parent))
+        row = np.empty(len(unique), dtype=np.int64)
+        row[order] = n_rows + np.arange(len(unique))
+
+        symbol.append((unique % n_symbols)[order])
+        freq.append(child_freq[order])
+        parent.append(child_parent[order])
+        level_counts.append(len(unique))
+        n_rows += len(unique)
+        level += 1
+        # end sectors have no children
+        node = row[inverse][going]
+        sequence = sequence[going]
+
+    symbol = np.concatenate(symbol)
+    parent = np.concatenate(parent)
+    level = np.repeat(np.arange(len(level_counts)), level_counts)
+    # every node's children are one run, in the order of their parents
+    n_children = np.bincount(parent[1:], minlength=n_rows)
+    first_child = np.cumsum(n_children) - n_children + 1
+    return FlatTree(list(table.symbols), symbol.astype(np.int32),
+                    np.concatenate(freq), parent, level.astype(np.int32),
+                    first_child.astype(np.int64), n_children.astype(np.int64),
+                    separator)
@@ -0,0 +1,431 @@
+"""a long running renderer, so drawing a diagram doesn't pay for starting
+python, importing pyx and starting latex every time
+
+    python -m sunburst.server --port 8350
+    python -m sunburst.server --socket /tmp/sunburst.sock
+
+jobs are json sent over http, on localhost or a unix socket:
+
+    POST /render           draw a job and send the file back when it's done,
+                           the job is forgotten once it's sent
+    POST /jobs             queue a job, answers with its id straight away
+    GET /jobs/<id>         how a job is getting on, and its stats when done
+    GET /jobs/<id>/result  wait for a job and send its file back
+    DELETE /jobs/<id>      cancel a job
+
+a job looks like
+
+    {"format": "svg",
+     "settings": {"data": {"prefix": "th"}},
+     "counts": {"the": 12, "then": 3}}
+
+with the words coming from one of "counts", a {word: freq} dict, "text", a
+string of lines to count the words of, "source_dir", a directory of code to
+parse, or "tree", a file from sunburst.treefile. "settings" changes the
+settings from the config file for this job alone. for more than one diagram,
+"diagrams" is a list of these, each with an optional "origin" and "name"
+
+    curl --unix-socket /tmp/sunburst.sock -d @job.json localhost/render > out.svg
+
+source_dir and tree are paths on this machine, so only serve it to people
+who could run run.py here anyway
+
+"""
+
+import argparse
+import itertools
+import json
+import os
+import queue
+import shutil
+import socketserver
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .backends import create_backend
+from .colormap import TEXT_COLOR
+from .stats import Stats
+from .sunburst import generate_diagrams, output, change_settings
+
+
+CONTENT_TYPES = {'pdf': 'application/pdf',
+                 'svg': 'image/svg+xml',
+                 'png': 'image/png'}
+# where each diagram's words come from in a job
+SOURCES = ('counts', 'text', 'source_dir', 'tree')
+CHUNK = 64*1024
+
+
+class Cancelled(Exception):
+    pass
+
+
+class QueueFull(Exception):
+    pass
+
+
+class JobStats(Stats):
+    """the stats of one job, which also stops it at the next stage once it
+    has been cancelled. a diagram can't be stopped part way through a stage"""
+
+    def __init__(self, job):
+        Stats.__init__(self)
+        self.job = job
+
+    def stage(self, name):
+        if self.job.cancelled.is_set():
+            raise Cancelled('job %s was cancelled' % self.job.id)
+        return Stats.stage(self, name)
+
+
+class Job(object):
+    """one request to draw, and what came of it
+
+    state goes from queued to running to one of done, failed or cancelled
+    """
+
+    def __init__(self, job_id, spec):
+        self.id = job_id
+        self.spec = spec
+        self.state = 'queued'
+        self.error = None
+        self.file_name = None
+        self.format = None
+        self.stats = JobStats(self)
+        self.cancelled = threading.Event()
+        self.finished = threading.Event()
+
+    def status(self):
+        status = {'id': self.id, 'state': self.state}
+        if self.error:
+            status['error'] = self.error
+        if self.state == 'done':
+            status['stats'] = self.stats.as_dict()
+        return status
+
+
+class RenderServer(object):
+    """keeps the renderers warm and draws queued jobs
+
+    arguments:
+        settings: the settings from the config file, jobs start from these
+        concurrency: how many jobs are drawn at once
+        max_queue: how many jobs can wait before new ones are turned away
+        keep: how many finished jobs to keep the results of
+
+    jobs are drawn in threads of this process so they all share the one
+    latex process and label cache. pdf labels are typeset one job at a time
+
+    """
+
+    def __init__(self, settings, concurrency=1, max_queue=16, keep=64):
+        self.settings = settings
+        self.queue = queue.Queue(max_queue)
+        self.keep = keep
+        self.jobs = {}
+        self.finished = []  # ids of finished jobs, oldest first
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.directory = tempfile.mkdtemp(prefix='sunburst-')
+        self.workers = [threading.Thread(target=self.work,
+                                         name='sunburst-render-%d' % index,
+                                         daemon=True)
+                        for index in range(concurrency)]
+
+    def start(self):
+        for worker in self.workers:
+            worker.start()
+
+    def warm(self):
+        """import the default backend and start its text engine, so the
+        first job doesn't pay for it"""
+        backend = create_backend(self.settings['output'].get('format', 'pdf'),
+                                 self.settings)
+        backend.prepare_labels(['warm'], TEXT_COLOR)
+
+    def submit(self, spec):
+        """queue a job, raises QueueFull if too many are waiting"""
+        with self.lock:
+            job = Job(str(next(self.ids)), spec)
+            try:
+                self.queue.put_nowait(job)
+            except queue.Full:
+                raise QueueFull('%d jobs are waiting already'
+                                % self.queue.maxsize)
+            self.jobs[job.id] = job
+        return job
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """a queued job is never drawn, a running one stops at its next
+        stage. returns the job, or None if there's no such job"""
+        job = self.get(job_id)
+        if job is None or job.finished.is_set():
+            return job
+        job.cancelled.set()
+        with self.lock:
+            queued = job.state == 'queued'
+            if queued:
+                job.state = 'cancelled'
+        if queued:
+            # nothing to wait for, the worker skips it when it comes up
+            self.finish(job)
+        return job
+
+    def work(self):
+        while True:
+            job = self.queue.get()
+            with self.lock:
+                if job.state != 'queued':
+                    continue
+                job.state = 'running'
+            try:
+                self.render(job)
+                job.state = 'done'
+            except Cancelled:
+                job.state = 'cancelled'
+            except Exception as error:
+                job.state = 'failed'
+                job.error = '%s: %s' % (type(error).__name__, error)
+            self.finish(job)
+
+    def finish(self, job):
+        job.finished.set()
+        with self.lock:
+            self.finished.append(job.id)
+            # forget the oldest jobs, and their files
+            while len(self.finished) > self.keep:
+                old = self.jobs.pop(self.finished.pop(0), None)
+                if old is not None and old.file_name:
+                    remove(old.file_name)
+                    old.file_name = None
+
+    def open_result(self, job):
+        """the file a done job drew, opened, or None if it's gone. it stays
+        readable once open, even if the job is forgotten"""
+        with self.lock:
+            if job.file_name is None:
+                return None
+            return open(job.file_name, 'rb')
+
+    def forget(self, job):
+        """drop a job and its file, nobody can ask for them again"""
+        with self.lock:
+            self.jobs.pop(job.id, None)
+            file_name, job.file_name = job.file_name, None
+        if file_name:
+            remove(file_name)
+
+    def render(self, job):
+        spec = job.spec
+        # a copy, the settings of the server are shared by every job
+        settings = dict(change_settings(self.settings, spec.get('settings')))
+        # diagrams in a job are parsed and drawn one after another, other
+        # jobs are what runs alongside
+        settings['output'] = dict(settings['output'], processes=1)
+        settings['data'] = dict(settings['data'], processes=1)
+        job.format = spec.get('format',
+                              settings['output'].get('format', 'pdf'))
+        if job.format not in CONTENT_TYPES:
+            raise ValueError("unknown format '%s'" % job.format)
+
+        data = []
+        # a job with no list of diagrams is one diagram, its settings have
+        # been used already
+        diagrams = spec.get('diagrams') or [dict(spec, settings=None)]
+        for index, diagram in enumerate(diagrams):
+            sources = [name for name in SOURCES if name in diagram]
+            if len(sources) != 1:
+                raise ValueError('each diagram needs one of %s'
+                                 % ', '.join(SOURCES))
+            value = diagram[sources[0]]
+            if sources[0] == 'counts':
+                data_source = ('counts', value)
+            elif sources[0] == 'text':
+                # any lines can be counted like a trace
+                data_source = ('trace', value.splitlines(True))
+            elif sources[0] == 'source_dir':
+                # each diagram keeps its own directory
+                data_source = ('raw', value)
+            else:
+                data_source = ('file', value)
+            origin = diagram.get('origin',
+                                 (index*settings['output']['xdelta'], 0))
+            data.append((diagram.get('name', 'diagram%d' % index),
+                         tuple(origin), data_source, diagram.get('settings')))
+
+        backend = create_backend(job.format, settings)
+        generate_diagrams(data, backend, settings, None, job.stats)
+        job.file_name = output(os.path.join(self.directory, job.id),
+                               backend, job.stats)
+
+    def close(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def remove(file_name):
+    try:
+        os.remove(file_name)
+    except OSError:
+        pass
+
+
+class RenderHandler(BaseHTTPRequestHandler):
+    """the http side of a RenderServer, self.server.renderer"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def address_string(self):
+        # unix sockets have no address
+        return str(self.client_address[0]) if self.client_address else 'unix'
+
+    def send_json(self, code, value):
+        body = json.dumps(value).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_result(self, job, forget=False):
+        """wait for a job, then send its file in chunks as it's read. with
+        forget the job is dropped once it's done, like for /render"""
+        renderer = self.server.renderer
+        job.finished.wait()
+        if job.state != 'done':
+            if forget:
+                renderer.forget(job)
+            self.send_json(409 if job.state == 'cancelled' else 500,
+                           job.status())
+            return
+        result = renderer.open_result(job)
+        if forget:
+            renderer.forget(job)
+        if result is None:
+            # sent to a /render already, or old enough to be forgotten
+            self.send_json(410, {'error': 'the result of job %s is gone'
+                                          % job.id})
+            return
+        with result:
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPES[job.format])
+            self.send_header('Content-Length',
+                             str(os.fstat(result.fileno()).st_size))
+            self.send_header('X-Sunburst-Job', job.id)
+            self.end_headers()
+            shutil.copyfileobj(result, self.wfile, CHUNK)
+
+    def read_job(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            spec = json.loads(self.rfile.read(length).decode('utf-8'))
+        except ValueError as error:
+            self.send_json(400, {'error': 'bad json: %s' % error})
+            return None
+        if not isinstance(spec, dict):
+            self.send_json(400, {'error': 'a job is a json object'})
+            return None
+        try:
+            return self.server.renderer.submit(spec)
+        except QueueFull as error:
+            self.send_json(503, {'error': str(error)})
+            return None
+
+    def find_job(self):
+        """the job named in the path, and what comes after its id"""
+        parts = self.path.strip('/').split('/')
+        job = None
+        if len(parts) in (2, 3) and parts[0] == 'jobs':
+            job = self.server.renderer.get(parts[1])
+        if job is None:
+            self.send_json(404, {'error': 'no job at %s' % self.path})
+        return job, parts[2:]
+
+    def do_POST(self):
+        if self.path not in ('/render', '/jobs'):
+            self.send_json(404, {'error': 'no such endpoint %s' % self.path})
+            return
+        job = self.read_job()
+        if job is None:
+            return
+        if self.path == '/jobs':
+            self.send_json(202, job.status())
+        else:
+            self.send_result(job, forget=True)
+
+    def do_GET(self):
+        job, rest = self.find_job()
+        if job is None:
+            return
+        if rest == ['result']:
+            self.send_result(job)
+        elif not rest:
+            self.send_json(200, job.status())
+        else:
+            self.send_json(404, {'error': 'no such endpoint %s' % self.path})
+
+    def do_DELETE(self):
+        job, rest = self.find_job()
+        if job is None:
+            return
+        self.server.renderer.cancel(job.id)
+        self.send_json(200, job.status())
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(renderer, port=None, socket_path=None, host='127.0.0.1'):
+    """answer http requests for renderer until interrupted"""
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = UnixHTTPServer(socket_path, RenderHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), RenderHandler)
+    server.renderer = renderer
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if socket_path:
+            remove(socket_path)
+    return server
+
+
+def main():
+    import yaml
+
+    parser = argparse.ArgumentParser(prog='python -m sunburst.server',
+                                     description='draw diagrams on request')
+    parser.add_argument('--config', default='config.yaml')
+    parser.add_argument('--port', type=int, default=8350)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--socket', help='listen on a unix socket at this '
+                                         'path instead of a port')
+    parser.add_argument('--concurrency', type=int, default=1,
+                        help='how many jobs are drawn at once')
+    parser.add_argument('--max-queue', type=int, default=16,
+                        help='how many jobs can wait')
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as config:
+        settings = yaml.safe_load(config)
+    renderer = RenderServer(settings, args.concurrency, args.max_queue)
+    renderer.warm()
+    renderer.start()
+    try:
+        serve(renderer, args.port, args.socket, args.host)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        renderer.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""optional numbers about a run: how long each stage took, how much it
+allocated, and counters for how much got drawn. everything takes a stats
+object, NO_STATS is used when nobody asked for any and costs nothing"""
+
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+# stages in the order they run, for the report
+STAGES = ['parse', 'count', 'layout', 'render', 'text', 'output']
+# counters that keep the largest value rather than adding up
+MAXIMUMS = set(['deepest_level'])
+
+
+class Stats(object):
+    """collects the time of each stage, the peak bytes allocated in each
+    stage when allocations is set, and named counters
+
+    the same stage can run more than once, once per diagram, and the times
+    and counts add up
+
+    """
+
+    def __init__(self, allocations=False):
+        self.allocations = allocations
+        self.seconds = {}
+        self.peak_bytes = {}
+        self.counters = {}
+
+    @contextmanager
+    def stage(self, name):
+        """time everything in the with block as the stage name"""
+        started = False
+        if self.allocations:
+            # someone else might be tracing already, a benchmark say
+            if tracemalloc.is_tracing():
+                tracemalloc.reset_peak()
+            else:
+                tracemalloc.start()
+                started = True
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] = (self.seconds.get(name, 0) +
+                                  time.perf_counter() - start)
+            if self.allocations:
+                peak = tracemalloc.get_traced_memory()[1]
+                self.peak_bytes[name] = max(self.peak_bytes.get(name, 0),
+                                            peak)
+                if started:
+                    tracemalloc.stop()
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def maximum(self, name, value):
+        """keep the largest value seen for a counter"""
+        self.counters[name] = max(self.counters.get(name, value), value)
+
+    def merge(self, other):
+        """add the numbers from another Stats, such as one that came back
+        from a worker process"""
+        for name, seconds in other.seconds.items():
+            self.seconds[name] = self.seconds.get(name, 0) + seconds
+        for name, peak in other.peak_bytes.items():
+            self.peak_bytes[name] = max(self.peak_bytes.get(name, 0), peak)
+        for name, value in other.counters.items():
+            if name in MAXIMUMS:
+                self.maximum(name, value)
+            else:
+                self.count(name, value)
+
+    def as_dict(self):
+        return {'seconds': self.seconds,
+                'peak_bytes': self.peak_bytes,
+                'counters': self.counters}
+
+    def to_json(self, file_name):
+        with open(file_name, 'w') as json_file:
+            json.dump(self.as_dict(), json_file, indent=2, sort_keys=True)
+
+    def report(self):
+        """a table that's readable in a terminal"""
+        lines = ['%-8s %10s %12s' % ('stage', 'seconds', 'peak MiB')]
+        stages = STAGES + sorted(set(self.seconds) - set(STAGES))
+        for name in stages:
+            if name not in self.seconds:
+                continue
+            peak = self.peak_bytes.get(name)
+            lines.append('%-8s %10.4f %12s' % (
+                name, self.seconds[name],
+                '' if peak is None else '%.2f' % (peak/2.0**20)))
+        for name in sorted(self.counters):
+            lines.append('%-20s %d' % (name, self.counters[name]))
+        return '\n'.join(lines)
+
+
+class NoStats(Stats):
+    """does nothing, for when no stats were asked for"""
+
+    @contextmanager
+    def stage(self, name):
+        yield
+
+    def count(self, name, amount=1):
+        pass
+
+    def maximum(self, name, value):
+        pass
+
+
+NO_STATS = NoStats()
@@ -1,138 +1,242 @@
 """python file to create a sunburst diagram using most used words in English,
 each layer represents the letter at that index in the word"""
 
-from math import sin, cos, pi  #'
-from pyx import path, style, color, text, trafo  #'
-from .colormap import color_map
-from .code_parser import parse_source, parse_trace
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from math import pi  #'
 
+import numpy as np
 
-text.set(text.LatexRunner)  #'
-text.preamble(r"\usepackage{cmtt}")  #'
+from .colormap import palette, LINE_COLOR, RED, TEXT_COLOR
+from .layout import OTHER_LABEL
+from .pipeline import NoWords, Pipeline
+from .backends import TEXT
+from .backends.fragment import FragmentBackend
+from .stats import NO_STATS
 
 
-def generate_diagrams(data, shape_canvas, text_canvas, settings, source_path):
+def generate_diagrams(data, backend, settings, source_path, stats=NO_STATS):
+    """draw every diagram in data onto backend
+
+    with output.processes set to anything but 1 the diagrams are parsed,
+    laid out and drawn in a pool of worker processes, each into its own
+    fragment, and the fragments are drawn onto backend in the order of data.
+    diagrams of traces are always drawn one after another here, since the
+    trace is only complete once the diagrams before it are done, and their
+    sources are parsed here too so the tracer sees it. drawn here,
+    the diagrams share a Pipeline, so anything two of them have in common,
+    like the words of a source, is only worked out once
+
+    a ('raw',) data source parses source_path, ('raw', source_dir) parses
+    source_dir instead, so diagrams of different code can be drawn together
+
+    stats is a Stats to collect timings and counters in, the workers send
+    theirs back to be added to it
+
+    """
     diagrams = {}
     # draw bounding box so the file is the right size and shape
     x = settings['output']['x']
     y = settings['output']['y']
 
     # draw the bounding box
-    shape_canvas.stroke(path.rect(-0.25*x, -0.5*y, x, y),
-                        [color.rgb.white, style.linewidth(0.001)])
-    for entry in data:
-        name = entry[0]
-        origin = entry[1]
-        data_source = entry[2]
-        diagrams[name] = Sunburst(shape_canvas,
-                                  text_canvas,
-                                  settings,
-                                  source_path,
-                                  name,
-                                  origin,
-                                  data_source)
-        diagrams[name].draw()
-        stop_trace()
+    backend.bounding_box(-0.25*x, -0.5*y, x, y)
+
+    processes = settings['output'].get('processes', 1)
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = min(processes, len(data))
+    if any(entry[2][0] == 'trace' for entry in data):
+        processes = 1
+        # the tracer only sees this process, so parsing in worker processes
+        # would leave it out of the trace
+        settings = dict(settings)
+        settings['data'] = dict(settings['data'], processes=1)
+
+    if processes <= 1:
+        # one pipeline for every diagram, so diagrams of the same data only
+        # parse it once
+        pipeline = Pipeline(stats)
+        for entry in data:
+            name = entry[0]
+            origin = entry[1]
+            data_source = entry[2]
+            diagrams[name] = Sunburst(backend,
+                                      diagram_settings(settings, entry),
+                                      source_path,
+                                      name,
+                                      origin,
+                                      data_source,
+                                      stats,
+                                      pipeline)
+            diagrams[name].draw()
+            stop_trace()
+        return diagrams
+
+    # every worker has a diagram to itself, so they parse in one process
+    # rather than each starting a pool of their own
+    worker_settings = dict(settings)
+    worker_settings['data'] = dict(settings['data'])
+    if worker_settings['data'].get('processes') is None:
+        worker_settings['data']['processes'] = 1
+    with ProcessPoolExecutor(processes) as pool:
+        fragments = pool.map(draw_fragment, data, repeat(worker_settings),
+                             repeat(source_path), repeat(stats))
+        for entry, (fragment, worker_stats) in zip(data, fragments):
+            stats.merge(worker_stats)
+            # labels are only typeset here, when they reach the real backend
+            stats.count('labels_typeset', fragment.replay(backend))
+            diagrams[entry[0]] = Sunburst(backend,
+                                          diagram_settings(settings, entry),
+                                          source_path, entry[0], entry[1],
+                                          entry[2], stats)
+    stop_trace()
     return diagrams
 
 
+def diagram_settings(settings, entry):
+    """the settings for one diagram, an entry can have a fourth item of
+    settings to change for it alone, like {'data': {'prefix': 'th'}}"""
+    if len(entry) < 4:
+        return settings
+    return change_settings(settings, entry[3])
+
+
+def change_settings(settings, changes):
+    """settings with some of their values changed, one section deep"""
+    if not changes:
+        return settings
+    changed = dict(settings)
+    for section, values in changes.items():
+        changed[section] = dict(settings.get(section, {}), **values)
+    return changed
+
+
+def draw_fragment(entry, settings, source_path, stats):
+    """draw one diagram into a fragment, run in the worker processes. stats
+    is a fresh copy in each worker, and goes back with the fragment"""
+    fragment = FragmentBackend()
+    Sunburst(fragment, diagram_settings(settings, entry), source_path,
+             entry[0], entry[1], entry[2], stats).draw()
+    return fragment, stats
+
+
 def stop_trace():
     """a function that, when called, tells trace to stop tracing"""
     pass
 
 
-def output(file_name, shape_canvas, text_canvas):
-    shape_canvas.insert(text_canvas)
-    shape_canvas.writePDFfile(file_name)  #'
+def output(file_name, backend, stats=NO_STATS):
+    """write the diagrams out, returns the name of the file written"""
+    with stats.stage('output'):
+        written = backend.output(file_name)  #'
+    if written and os.path.exists(written):
+        stats.count('bytes_written', os.path.getsize(written))
+    return written
+
+
+# connector widths are rounded to this many significant digits so
+# connectors of almost the same width can be stroked as one path, however
+# thin they are
+BEZIER_PRECISION = 3
 
 
 class TextLayer(object):
     """class to create all the text and format it appropriately"""
 
-    def __init__(self, canvas, origin, color_map, sector_width):
-        self.canvas = canvas
-        self.sectors = {}  # info from the sector
+    def __init__(self, backend, origin, color_map, sector_width,
+                 stats=NO_STATS):
+        self.backend = backend
+        self.stats = stats
         self.xo = origin[0]
         self.yo = origin[1]
         self.color_map = color_map
         self.sector_width = sector_width
-        # set the font
-
-    def draw(self):
-        """draw the text!!"""
-
-        for layer in self.sectors:
-            radius = self.sectors[layer]['radius']
-            letter_radius = radius + 0.25*self.sector_width
-
-            prev_radian = 0
-            for radian in self.sectors[layer]['letters']:
-                end = False
-                letter = self.sectors[layer]['letters'][radian][0]
-                if len(letter) > 1:
-                    end = True
-                freq = self.sectors[layer]['letters'][radian][1]
-
-                offset = False
-                cur_radian = radian
-
-                if (radian-prev_radian)*letter_radius < 0.22:
-                    cur_radian = prev_radian + 0.22/letter_radius
-                    prev_radian = cur_radian
-                    offset = True
-
-                centroid_x = radius*cos(radian)+self.xo
-                centroid_y = radius*sin(radian)+self.yo
-                if end:
-                    letter_x = radius*cos(cur_radian)+self.xo
-                    letter_y = radius*sin(cur_radian)+self.yo
-                else:
-                    letter_x = letter_radius*cos(cur_radian)+self.xo
-                    letter_y = letter_radius*sin(cur_radian)+self.yo
-
-
-                # rotate the text accordingly
-                transform = trafo.rotate(radian*180/pi)
-
-                if cur_radian > pi/2 and cur_radian < (3*pi/2):
-                    transform = trafo.rotate(180+radian*180/pi)
-
-                # if this condition is true then the letter is actually the
-                # whole word, it is an end sector, so display the frequency
-                if len(letter) > 1:
-                    letter += ' '
-                    letter += str(freq)
-
-                # the random floats are me tuning the color just right lol
-                text_color = color.rgb(0, 0.0784*1.4, 0.156*1.4)
-                self.canvas.text(letter_x, letter_y,
-                                 r"\texttt{"+letter+'}',
-                                 [text.halign.center, text.valign.middle,
-                                  transform, text.size.scriptsize, text_color])
-                if offset:
-                    self.canvas.stroke(path.line(centroid_x, centroid_y,
-                                                 letter_x, letter_y),
-                                       [style.linewidth(0.0035), text_color]
-                                      )
-                self.canvas.fill(path.circle(centroid_x, centroid_y,
-                                 0.0065), [text_color])
-                prev_radian = cur_radian
-
-
-    def update(self, layer, letter, centroid, letter_freq):
-        """sectors will call this to update the text info
-
-        layer: the layer number of the sector
-        letter: the letter of the sector
-        centroid: a tule of (radians, radius)
 
-        """
-        if layer not in self.sectors.keys():
-            self.sectors[layer] = {'radius': centroid[1],
-                                   'letters':
-                                       {centroid[0]: (letter, letter_freq)}}
-        else:
-            self.sectors[layer]['letters'][centroid[0]] = (letter, letter_freq)
+    def draw(self, layout):
+        """draw the text!! a ring at a time, like the sectors, so only one
+        ring's labels are ever held at once"""
+        for ring in layout.rings():
+            placement = self.place(layout, ring)
+            if placement is None:
+                continue
+            labels, x, y, angle, moved, centroid_x, centroid_y = placement
+
+            # the distinct labels of the ring are typeset together
+            typeset = self.backend.prepare_labels(set(labels), TEXT_COLOR)
+            self.stats.count('labels_drawn', len(labels))
+            self.stats.count('labels_typeset', typeset or 0)
+            for label, label_x, label_y, label_angle in zip(
+                    labels, x.tolist(), y.tolist(), angle.tolist()):
+                self.backend.draw_label(label, label_x, label_y, label_angle,
+                                        TEXT_COLOR)
+
+            # the leader lines and centroid dots all look the same, so each
+            # kind is drawn in one go
+            if moved.any():
+                self.backend.stroke_lines(
+                    list(zip(centroid_x[moved].tolist(),
+                             centroid_y[moved].tolist(),
+                             x[moved].tolist(), y[moved].tolist())),
+                    TEXT_COLOR, 0.0035, TEXT)
+            self.backend.fill_circles(
+                list(zip(centroid_x.tolist(), centroid_y.tolist())),
+                0.0065, TEXT_COLOR, TEXT)
+
+    def place(self, layout, ring):
+        """the labels of one ring and where they go, each label sits on the
+        anchor from the layout unless it had to be nudged clear of the one
+        before. None if nothing in the ring is labelled"""
+        rows = np.arange(ring.start, ring.stop)[layout.labelled[ring]]
+        if not len(rows):
+            return None
+        radian = layout.centroid[rows]
+        # labels are kept apart along the plain sectors of the ring, chains
+        # reach further out
+        letter_radius = float(layout.centroid_r[rows].min()) + \
+            0.25*self.sector_width
+        placed, moved = nudge(radian.tolist(), letter_radius)
+
+        label_r = layout.label_r[rows]
+        x = np.where(moved, label_r*np.cos(placed) + self.xo,
+                     layout.label_x[rows])
+        y = np.where(moved, label_r*np.sin(placed) + self.yo,
+                     layout.label_y[rows])
+        # rotate the text accordingly, upside down text is turned round
+        angle = radian*180/pi
+        angle = np.where((placed > pi/2) & (placed < 3*pi/2), angle + 180,
+                         angle)
+
+        labels = []
+        for row in rows.tolist():
+            label = layout.label(row)
+            # the label is the whole word of an end sector, so display the
+            # frequency
+            if layout.end[row] or layout.other[row]:
+                label += ' ' + str(int(layout.freq[row]))
+            labels.append(label)
+        return (labels, x, y, angle, moved, layout.centroid_x[rows],
+                layout.centroid_y[rows])
+
+
+def nudge(radians, radius, gap=0.22):
+    """where labels at the angles in radians go round a ring so they are at
+    least gap apart at radius, and which of them had to move. every label
+    depends on the one before, so it's a plain loop"""
+    placed = []
+    moved = []
+    prev_radian = 0
+    for radian in radians:
+        cur_radian = radian
+        offset = (radian-prev_radian)*radius < gap
+        if offset:
+            cur_radian = prev_radian + gap/radius
+        placed.append(cur_radian)
+        moved.append(offset)
+        prev_radian = cur_radian
+    return np.array(placed), np.array(moved, dtype=bool)
 
 
 class Sunburst(object):
@@ -140,16 +244,20 @@ class Sunburst(object):
     settings"""
 
     def __init__(self,
-                 shape_canvas,
-                 text_canvas,
+                 backend,
                  settings,
                  source,
                  name,
                  origin,
-                 data_source):
-
-        self.shape_canvas = shape_canvas
-        self.text_canvas = text_canvas
+                 data_source,
+                 stats=NO_STATS,
+                 pipeline=None):
+
+        self.backend = backend
+        self.stats = stats
+        # diagrams sharing a pipeline share the parsing and layout they
+        # have in common
+        self.pipeline = pipeline if pipeline is not None else Pipeline(stats)
         # data properties
         self.text_object = None
         self.alphabet = None
@@ -159,6 +267,9 @@ class Sunburst(object):
         self.data = None  # from the settings file
         self.layer = None  # from the settings file
         self.source = source
+        if data_source[0] == 'raw' and len(data_source) > 1:
+            # ('raw', source_dir) parses a directory of its own
+            self.source = data_source[1]
 
         self.name = name
         self.origin = origin
@@ -175,280 +286,105 @@ class Sunburst(object):
         self.layer = self.settings['layer']
         self.alphabet = self.data['alphabet']
         self.numbers = self.data['numbers']
-        self.color_map = color_map(self.alphabet, self.numbers)
-        self.text_object = TextLayer(self.text_canvas, self.origin,
-                self.color_map, self.layer['sector_width'])
+        self.color_map = self.pipeline.color_map(self.alphabet, self.numbers)
+        self.text_object = TextLayer(self.backend, self.origin,
+                self.color_map, self.layer['sector_width'], self.stats)
 
 
     def draw(self):
         """begin calculating the diagram"""
         # get the settings from the config file
         self.import_settings()
-        words = None
-        if self.data_source[0] == 'raw':
-            words = parse_source(self.source, self.alphabet, self.numbers)
-        elif self.data_source[0] == 'trace':
-            words = parse_trace(self.data_source[1], self.alphabet, self.numbers)
-        # find how big the bounding box needs to be
-        max_len = 0
-        for word in words:
-            if len(word) > max_len:
-                max_len = len(word)
-        # instantiate the very first layer
-        origin = Sector(self, words)
-        # recursively draw all other layers
-        origin.create_child_segments()
-        self.text_object.draw()
-
-
-class Sector(object):
-    """A slice of the sunburst graph, should have a parent sector and children
-    sectors"""
-
-    # these defaults create the root sector
-    def __init__(self,
-                 sunburst,
-                 parent_list,
-                 level=0,
-                 letter='ORIGIN',
-                 start_percent=0,  # decimal 0-1
-                 end_percent=1,  # decimal 0-1
-                 freq=0,
-                 inner_r=0,
-                 parent_angle=0,  # degrees
-                 parent_arc=360,  # degrees
-                 parent_centroid_radian=0,  # radians
-                 parent_outer_radius=0,
-                 parent_color=color.rgb.white,
-                 path=''):
-
-        # assigned by constructor
-        self.sunburst = sunburst
-        self.parent_list = parent_list  # the list the parent sector passes on
-        self.level = level  # to stop recursion
-        self.letter = letter  # what letter is it?
-        # after truncating the parent sector letter
-        self.inner_r = inner_r
-        self.parent_centroid_radian = parent_centroid_radian  # rad
-        self.parent_outer_radius = parent_outer_radius
-        self.parent_color = parent_color
-
-        # calculated using constructor
-        self.start_angle = start_percent*parent_arc + parent_angle  # deg
-        self.end_angle = end_percent*parent_arc + parent_angle  # deg
-
-        # assigned from sunburst class
-        self.max_level = self.sunburst.data['max_recursion']
-        self.shape_canvas = self.sunburst.shape_canvas
-        self.layer_width = self.sunburst.layer['layer_width']
-        self.sector_width = self.sunburst.layer['sector_width']
-
-        self.centroid_radians = 0.5*(self.end_angle+self.start_angle)*pi/180.0
-
-        self.path = path
-        self.freq = freq
-
-        self.xo = self.sunburst.origin_x
-        self.yo = self.sunburst.origin_y
-
-        if self.level > 0:
-            self.sector_color = self.sunburst.color_map[self.letter]
-        else:
-            self.sector_color = color.rgb.black
-
-    def draw_sector(self, end):
-        """draw the sector"""
-        segment = path.path(path.arc(self.xo, self.yo,
-                                     self.inner_r,
-                                     self.start_angle, self.end_angle),
-                            path.arcn(self.xo, self.yo,
-                                      self.sector_width+self.inner_r,
-                                      self.end_angle, self.start_angle),
-                            path.closepath())
-        self.shape_canvas.fill(segment, [self.sector_color])
-
-        # draw a delimiting line between sectors
-        line_color = color.gray(0.15)
-        if end and (self.end_angle - self.start_angle) < 0.25:
-            line_color = color.rgb.red
-
-        r = self.inner_r + self.sector_width
-        start_radians = self.start_angle*pi/180.0
-        end_radians = self.end_angle*pi/180.0
-        x0 = self.inner_r*cos(start_radians)+self.xo
-        y0 = self.inner_r*sin(start_radians)+self.yo
-        x1 = r*cos(start_radians)+self.xo
-        y1 = r*sin(start_radians)+self.yo
-
-        self.shape_canvas.stroke(path.line(x0, y0, x1, y1),
-                [style.linewidth(0.01), line_color])
-
-        x0 = self.inner_r*cos(end_radians)+self.xo
-        y0 = self.inner_r*sin(end_radians)+self.yo
-        x1 = r*cos(end_radians)+self.xo
-        y1 = r*sin(end_radians)+self.yo
-
-
-        self.shape_canvas.stroke(path.line(x0, y0, x1, y1),
-                [style.linewidth(0.01), line_color])
-
-    def display(self):
-        """method to display the sector"""
-
-        # draw the segment
-        if self.level == 0:
-            # don't draw anything in the center
-            return
-
-        if self.letter == '':
-            self.sunburst.text_object.update(self.level, self.path[6:],
-                                             (self.centroid_radians,
-                                              self.inner_r +
-                                              0.5*self.sector_width),
-                                             self.freq)
-        else:
-            self.sunburst.text_object.update(self.level, self.letter,
-                                             (self.centroid_radians,
-                                              self.inner_r +
-                                              0.5*self.sector_width),
-                                             self.freq)
-
-        if self.letter == '':
-            self.draw_sector(True)
-        else:
-            self.draw_sector(False)
-
-        if self.level == 1:
-            # don't draw lines to nothing
+        # lay out every sector before drawing anything
+        tree = self.pipeline.tree(self.data_source, self.data, self.source)
+        try:
+            layout = self.lay_out(tree)
+        except NoWords as error:
+            # one diagram zoomed in on a prefix with no words is left empty
+            # rather than stopping the others being drawn
+            warnings.warn('%s is not drawn, %s' % (self.name, error))
+            self.stats.count('diagrams_not_drawn')
             return
-
-        # draw the bezier
-        x0 = (self.inner_r+0.05)*cos(self.centroid_radians)+self.xo
-        y0 = (self.inner_r+0.05)*sin(self.centroid_radians)+self.yo
-
-        r = self.parent_outer_radius
-        x1 = r*cos(self.centroid_radians)+self.xo
-        y1 = r*sin(self.centroid_radians)+self.yo
-
-        delta = 0.1*(self.centroid_radians - self.parent_centroid_radian)
-
-        r = self.inner_r
-        x2 = r*cos(self.parent_centroid_radian+delta)+self.xo
-        y2 = r*sin(self.parent_centroid_radian+delta)+self.yo
-
-        x3 = self.parent_outer_radius*cos(self.parent_centroid_radian+delta)+self.xo
-        y3 = self.parent_outer_radius*sin(self.parent_centroid_radian+delta)+self.yo
-
-        sector_len = (self.end_angle - self.start_angle)*self.inner_r*pi/180.0
-        self.shape_canvas.stroke(path.curve(x0, y0, x1, y1, x2, y2, x3, y3),
-                                 [style.linewidth(0.05*sector_len), self.sector_color])
-
-    def create_child_segment_lists(self):
-        """a method to create child segment lists. returns in the following
-        format:
-
-        [{'letter': a, 'freq': 1234, 'words': [{word: freq}, {word, freq}]}...]
-
-        }
-
+        self.draw_layout(layout)
+
+    def lay_out(self, tree):
+        """lay out a FlatTree with the settings for this diagram, with the
+        node for data.prefix in the centre when there is one"""
+        return self.pipeline.layout(tree, self.origin, self.layer, self.data)
+
+    def draw_layout(self, layout):
+        """draw the sectors and then the labels of a layout"""
+        stats = self.stats
+        stats.count('sectors_drawn', len(layout))
+        if len(layout):
+            stats.maximum('deepest_level', int(layout.level.max()))
+        with stats.stage('render'):
+            self.render(layout)
+        with stats.stage('text'):
+            self.text_object.draw(layout)
+
+    def render(self, layout):
+        """draw every sector in the layout table, a ring at a time
+
+        sectors are batched by ring and colour, so each batch is a single
+        object in the output. delimiting lines shared by two neighbouring
+        sectors are only drawn once. every ring is drawn as soon as it's
+        batched, so only one ring at a time is held as python objects
 
         """
-        child_sector_lists = {}
-        sorted_child_lists = []
-
-        for word in self.parent_list:
-            # if the first letter of the word - word[0][0] is not already a key
-            # in the dict, start a new key
-            freq = self.parent_list[word]
-            if not word:
-                # if word is an empty string, continue
-                child_sector_lists[word] = {'freq': freq,
-                                            'words': {}}
+        colors = palette(self.color_map, layout.tree.symbols)
+        # other sectors have the symbol -1, the end of the palette
+        colors.append(self.color_map[OTHER_LABEL])
+        for ring in layout.rings():
+            self.render_ring(layout, ring, colors)
+
+    def render_ring(self, layout, ring, colors):
+        """draw the rows of one ring"""
+        fills = {}  # symbol -> sectors
+        delimiters = {}  # (angle, span) -> (line, is it red?)
+        beziers = {}  # (symbol, width) -> curves
+        for row in range(ring.start, ring.stop):
+            span = int(layout.span[row])
+            symbol = int(layout.symbol[row])
+            start_angle = float(layout.start_angle[row])
+            end_angle = float(layout.end_angle[row])
+
+            fills.setdefault(symbol, []).append(
+                (float(layout.inner_r[row]), float(layout.outer_r[row]),
+                 start_angle, end_angle))
+
+            # a delimiting line between sectors, red for tiny end sectors
+            red = bool(layout.end[row]) and (end_angle - start_angle) < 0.25
+            for angle, line in ((start_angle, layout.start_line[row]),
+                                (end_angle, layout.end_line[row])):
+                key = (round(angle % 360.0, 9), span)
+                # a shared line is red if either side wants it red
+                edge_red = red or delimiters.get(key, (None, False))[1]
+                delimiters[key] = (tuple(line.tolist()), edge_red)
+
+            if not layout.has_bezier[row]:
+                # don't draw lines to nothing
                 continue
-            letter = word[0]
-            if letter not in child_sector_lists.keys():
-                # word[1] is the frequency, word[0][1:] removes the first
-                # letter
-                if len(word) == 1:
-                    # if removing the first character yields an empty string:
-                    child_sector_lists[letter] = {'freq': freq,
-                                                  'words': {'': freq}}
-                    continue
-
-                child_sector_lists[letter] = {'freq': freq,
-                                              'words': {word[1:]: freq}}
-            else:
-                # increment frequency accordingly
-                child_sector_lists[letter]['freq'] += freq
-                # if removing the first character yields an empty string:
-                if len(word) == 1:
-                    # add tuple to that list of words, removing first letter
-                    child_sector_lists[letter]['words'][''] = freq
-                    continue
-                child_sector_lists[letter]['words'][word[1:]] = freq
-
-        # commence sorting by frequncy
-        # we do this since having the frequency as the key in the above
-        # dict will lead to lost data if 2 letters have the same freq
-
-        # first populate a list of all letter frequencies
-        freqlist = []
-
-        for letter in child_sector_lists:
-            freqlist.append(child_sector_lists[letter]['freq'])
-        # then sort this list in descending order
-        freqlist.sort(reverse=True)
-
-        # now add the dicts into sorted_child_lists in the right order
-        for freq in freqlist:
-            for letter in child_sector_lists:
-                if child_sector_lists[letter]['freq'] == freq:
-                    sorted_child_lists.append({'letter': letter,
-                                               'freq': freq,
-                                               'words': child_sector_lists[
-                                                   letter]['words']})
-                    child_sector_lists.pop(letter)
-                    break
-        return sorted_child_lists
-        # this will look like:
-        # [{'letter': a, 'freq': 1234, 'words': {'ble': 123, 'ss': 432}}, ...]
-
-    def create_child_segments(self):
-        """initialize the child sector objects"""
-
-        # NOTE if this sector is an edofword, dont' create child segment
-
-        if self.level > self.max_level:
-            return
-
-        self.display()
-        if self.letter == '':
-            return
-
-        child_lists = self.create_child_segment_lists()
-
-        total_freq = 0
-        for child in child_lists:
-            total_freq += child['freq']
-
-        cur_percent = 0
-        for child in child_lists:
-            percent = float(child['freq'])/float(total_freq)
-            child_sector = Sector(self.sunburst,
-                                  child['words'],
-                                  self.level + 1,
-                                  child['letter'],
-                                  cur_percent,
-                                  cur_percent+percent,
-                                  child['freq'],
-                                  self.inner_r + self.layer_width,
-                                  self.start_angle,
-                                  self.end_angle - self.start_angle,
-                                  self.centroid_radians,
-                                  self.inner_r+self.sector_width,
-                                  self.sector_color,
-                                  self.path + self.letter
-                                  )
-
-            child_sector.create_child_segments()
-            cur_percent += percent
+            # round the widths so similar connectors can share a path
+            width = float('%.*g' % (BEZIER_PRECISION,
+                                    float(layout.bezier_width[row])))
+            beziers.setdefault((symbol, width), []).append(
+                tuple(layout.bezier[row].tolist()))
+
+        for symbol, sectors in fills.items():
+            self.backend.fill_sectors(self.origin, sectors, colors[symbol])
+
+        lines = {}  # is it red? -> lines
+        for line, red in delimiters.values():
+            lines.setdefault(red, []).append(line)
+        for red, items in lines.items():
+            line_color = RED if red else LINE_COLOR
+            self.backend.stroke_lines(items, line_color, 0.01)
+
+        for (symbol, width), curves in beziers.items():
+            self.backend.stroke_curves(curves, colors[symbol], width)
+
+        self.stats.count('delimiters', len(delimiters))
+        self.stats.count('bezier_connectors',
+                         sum(len(curves) for curves in beziers.values()))
+        self.stats.count('paths', len(fills) + len(lines) + len(beziers))
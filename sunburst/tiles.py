@@ -0,0 +1,151 @@
+"""png tiles of a diagram for a zoomable viewer, drawn on demand
+
+the diagram is laid out once and each tile only draws the sectors that can
+be seen in it. tiles are numbered like web maps: at zoom z the square around
+the diagram is split into 2**z by 2**z tiles, x counts from the left and y
+from the top
+
+    python -m sunburst.tiles counts.sbt tiles/ --max-zoom 4 --prefix th
+
+writes tiles/<z>/<x>/<y>.png for every tile up to max zoom, counts.sbt being
+a file saved with python -m sunburst.treefile
+
+"""
+
+import argparse
+import os
+
+import numpy as np
+
+from .backends.raster import RasterBackend
+from .sunburst import Sunburst
+
+
+TILE_SIZE = 256
+
+
+def visible_rows(layout, origin, x0, y0, x1, y1):
+    """the rows of layout that might draw something inside the rectangle
+    from (x0, y0) to (x1, y1)
+
+    a sector's connector reaches back to its parent, so a row is tested
+    against the ring inside it as well and the whole angle of its parent
+
+    """
+    xo, yo = origin
+    # how near and far the rectangle gets from the origin
+    near_x = np.clip(xo, x0, x1) - xo
+    near_y = np.clip(yo, y0, y1) - yo
+    near = np.hypot(near_x, near_y)
+    corners = np.array([[x0, y0], [x1, y0], [x0, y1], [x1, y1]]) - origin
+    far = np.hypot(corners[:, 0], corners[:, 1]).max()
+
+    has_parent = layout.parent >= 0
+    parent = np.maximum(layout.parent, 0)
+    inner = np.where(has_parent, layout.inner_r[parent], 0.0)
+    rows = (layout.outer_r >= near) & (inner <= far)
+    if near == 0:
+        # the origin is in the rectangle, every angle is
+        return np.nonzero(rows)[0]
+
+    # the angles the rectangle covers, it is never more than 180 degrees
+    centre = np.degrees(np.arctan2(0.5*(y0 + y1) - yo, 0.5*(x0 + x1) - xo))
+    spread = (np.degrees(np.arctan2(corners[:, 1], corners[:, 0])) -
+              centre + 180.0) % 360.0 - 180.0
+    low, high = centre + spread.min(), centre + spread.max()
+
+    start = np.where(has_parent, layout.start_angle[parent], 0.0)
+    end = np.where(has_parent, layout.end_angle[parent], 360.0)
+    overlap = np.zeros(len(layout), dtype=bool)
+    for turn in (-360.0, 0.0, 360.0):
+        overlap |= (start <= high + turn) & (end >= low + turn)
+    return np.nonzero(rows & overlap)[0]
+
+
+class TileRenderer(object):
+    """draws tiles of one diagram, the layout is worked out once up front
+
+    arguments:
+        tree: the FlatTree to draw, from a tree file or build_tree
+        settings: the same settings as generate_diagrams takes, data.prefix
+            zooms in on a prefix
+        tile_size: how many pixels across each tile is
+
+    """
+
+    def __init__(self, tree, settings, tile_size=TILE_SIZE):
+        self.settings = settings
+        self.tile_size = tile_size
+        self.origin = (0, 0)
+        self.layout = self.diagram(None).lay_out(tree)
+        # the square the tiles cover, a little past the outermost ring
+        outer = self.layout.outer_r.max() if len(self.layout) else 1.0
+        self.radius = 1.02*outer
+
+    def diagram(self, backend):
+        diagram = Sunburst(backend, self.settings, None, 'tiles', self.origin,
+                           ('counts', None))
+        diagram.import_settings()
+        return diagram
+
+    def bounds(self, z, x, y):
+        """the rectangle a tile covers, (x0, y0, x1, y1)"""
+        size = 2*self.radius/2**z
+        x0 = self.origin[0] - self.radius + x*size
+        y1 = self.origin[1] + self.radius - y*size
+        return x0, y1 - size, x0 + size, y1
+
+    def tile(self, z, x, y):
+        """the png bytes of one tile"""
+        if not (0 <= x < 2**z and 0 <= y < 2**z):
+            raise ValueError('there is no tile %d/%d/%d' % (z, x, y))
+        x0, y0, x1, y1 = self.bounds(z, x, y)
+        backend = RasterBackend(self.tile_size/(x1 - x0))
+        backend.bounding_box(x0, y0, x1 - x0, y1 - y0)
+        rows = visible_rows(self.layout, self.origin, x0, y0, x1, y1)
+        self.diagram(backend).draw_layout(self.layout.take(rows))
+        return backend.png()
+
+    def export(self, directory, max_zoom):
+        """write every tile up to max_zoom to directory/z/x/y.png, returns
+        how many were written"""
+        written = 0
+        for z in range(max_zoom + 1):
+            for x in range(2**z):
+                os.makedirs(os.path.join(directory, str(z), str(x)),
+                            exist_ok=True)
+                for y in range(2**z):
+                    with open(os.path.join(directory, str(z), str(x),
+                                           '%d.png' % y), 'wb') as png:
+                        png.write(self.tile(z, x, y))
+                    written += 1
+        return written
+
+
+def main():
+    import yaml
+    from .treefile import load_tree_file
+
+    parser = argparse.ArgumentParser(prog='python -m sunburst.tiles',
+                                     description='write png tiles of a '
+                                                 'saved diagram')
+    parser.add_argument('file_name', help='a file from sunburst.treefile')
+    parser.add_argument('directory')
+    parser.add_argument('--config', default='config.yaml')
+    parser.add_argument('--max-zoom', type=int, default=3)
+    parser.add_argument('--tile-size', type=int, default=TILE_SIZE)
+    parser.add_argument('--prefix', help='zoom in on the words starting '
+                                         'with this')
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as config:
+        settings = yaml.safe_load(config)
+    if args.prefix is not None:
+        settings['data']['prefix'] = args.prefix
+    tiles = TileRenderer(load_tree_file(args.file_name).tree, settings,
+                         args.tile_size)
+    print('wrote %d tiles' % tiles.export(args.directory, args.max_zoom))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""split text into words. the alphabet and numbers from the config file are
+compiled once into a regex, which then runs over whole buffers of text"""
+
+import re
+from functools import lru_cache
+
+
+def char_class(chars):
+    """a regex character class matching any of chars"""
+    return '[' + ''.join(re.escape(char) for char in sorted(chars)) + ']'
+
+
+class Tokenizer(object):
+    """finds the words in a buffer. a word is a run of letters and numbers
+    that starts with a letter, anything else separates words. underscores
+    are dropped from words when they are part of the alphabet"""
+
+    def __init__(self, alphabet, numbers):
+        letters = set(alphabet)
+        word_chars = letters | set(numbers)
+        if letters:
+            self.pattern = re.compile(char_class(letters) + '(?:' +
+                                      char_class(word_chars) + ')*')
+        else:
+            # nothing can start a word, so never match anything
+            self.pattern = re.compile('(?!)')
+        self.drop_underscores = '_' in letters
+
+    def tokenize(self, buffer):
+        """yields the words in buffer in order"""
+        if self.drop_underscores:
+            for match in self.pattern.finditer(buffer):
+                word = match.group().replace('_', '')
+                if word:
+                    yield word
+        else:
+            for match in self.pattern.finditer(buffer):
+                yield match.group()
+
+
+@lru_cache(maxsize=None)
+def get_tokenizer(alphabet, numbers):
+    """returns the compiled Tokenizer for these settings, only compiling it
+    the first time"""
+    return Tokenizer(alphabet, numbers)
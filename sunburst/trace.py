@@ -8,6 +8,52 @@ http://www.dalkescientific.com/writings/diary/archive/2005/04/20/tracing_python_
 import sys
 import os
 import linecache
+import threading
+
+
+# sys.monitoring tool ids tried in turn. 3 and 4 aren't claimed by anything
+# standard and only optimizers use 5, debuggers, coverage and profilers like
+# cProfile have 0, 1 and 2
+TOOL_IDS = (3, 4, 5)
+
+
+def create_trace(sunburst_dir, start_function, end_function,
+                 sample_interval=None):
+    """returns the cheapest tracer this version of python can run, call
+    start() on it to begin. with a sample_interval in seconds the lines are
+    sampled instead of every one being counted, see SampleTrace"""
+    if sample_interval:
+        return SampleTrace(sunburst_dir, start_function, end_function,
+                           sample_interval)
+    if hasattr(sys, 'monitoring') and free_tool_id() is not None:
+        return MonitorTrace(sunburst_dir, start_function, end_function)
+    return Trace(sunburst_dir, start_function, end_function)
+
+
+def free_tool_id():
+    """a sys.monitoring tool id nothing else is using, or None"""
+    for tool in TOOL_IDS:
+        if sys.monitoring.get_tool(tool) is None:
+            return tool
+    return None
+
+
+class TraceLines(object):
+    """the lines a tracer counted, each one comes out once per time it ran.
+    the source text is only looked up when this is iterated, so it can be
+    handed to parse_trace before the tracing has even happened"""
+
+    def __init__(self, counts):
+        self.counts = counts  # {(filename, lineno): hits}
+
+    def __len__(self):
+        return sum(self.counts.values())
+
+    def __iter__(self):
+        for (filename, lineno), hits in list(self.counts.items()):
+            line = linecache.getline(filename, lineno)
+            for _ in range(hits):
+                yield line
 
 
 class Trace(object):
@@ -23,6 +69,10 @@ class Trace(object):
         # have we finished tracing? only need to trace one runthrough
         self.traced = False
 
+    def start(self):
+        """start tracing, lines are only saved once start_function runs"""
+        sys.settrace(self.trace)
+
     def line_trace(self, frame, event, arg):
         """a callback to trace lines as they run and save them to a list"""
         if event == "line":
@@ -52,3 +102,173 @@ class Trace(object):
                     return self.line_trace
         return self.trace
 
+
+
+class MonitorTrace(object):
+    """a much cheaper tracer for python 3.12+ using sys.monitoring. lines are
+    only counted while running, the source is looked up at the end"""
+
+    def __init__(self, sunburst_dir, start_function, end_function):
+        self.counts = {}
+        self.lines = TraceLines(self.counts)
+        self.sunburst_dir = sunburst_dir
+        self.start_function = start_function.__name__
+        self.end_function = end_function.__name__
+        self.in_trace = False
+        self.traced = False
+        self.tool = None  # picked when it starts
+        # code object -> is it in the sunburst directory?
+        self.wanted = {}
+
+    def start(self):
+        """start listening for function calls, lines are only counted once
+        start_function runs"""
+        monitoring = sys.monitoring
+        self.tool = free_tool_id()
+        if self.tool is None:
+            raise RuntimeError('every sys.monitoring tool id is in use')
+        monitoring.use_tool_id(self.tool, 'sunburst')
+        monitoring.register_callback(self.tool, monitoring.events.PY_START,
+                                     self.call)
+        monitoring.register_callback(self.tool, monitoring.events.LINE,
+                                     self.line)
+        monitoring.set_events(self.tool, monitoring.events.PY_START)
+
+    def stop(self):
+        """stop monitoring and give the tool id back"""
+        monitoring = sys.monitoring
+        monitoring.set_events(self.tool, 0)
+        monitoring.register_callback(self.tool, monitoring.events.PY_START,
+                                     None)
+        monitoring.register_callback(self.tool, monitoring.events.LINE, None)
+        monitoring.free_tool_id(self.tool)
+        # turn every location we DISABLEd back on, for the next tool to
+        # have this id
+        monitoring.restart_events()
+
+    def call(self, code, offset):
+        """a callback for every function start, turns line events on and off"""
+        function = code.co_name
+        if function == self.start_function and not self.in_trace:
+            self.in_trace = True
+            sys.monitoring.set_events(self.tool,
+                                      sys.monitoring.events.PY_START |
+                                      sys.monitoring.events.LINE)
+        elif function == self.end_function and self.in_trace:
+            self.in_trace = False
+            self.traced = True
+            self.stop()
+        elif function != self.end_function:
+            # nothing else needs to be seen again
+            return sys.monitoring.DISABLE
+
+    def line(self, code, lineno):
+        """a callback for every line, only counts the sunburst code"""
+        wanted = self.wanted.get(code)
+        if wanted is None:
+            filedir = os.path.dirname(os.path.abspath(code.co_filename))
+            wanted = self.wanted[code] = filedir == self.sunburst_dir
+        if not wanted:
+            # don't trace lines for standard imports and pyx
+            return sys.monitoring.DISABLE
+        key = (code.co_filename, lineno)
+        self.counts[key] = self.counts.get(key, 0) + 1
+
+
+class SampleTrace(object):
+    """a statistical tracer, cheap enough to leave running on real traffic
+
+    instead of hooking every line, a background thread looks at what the
+    traced thread is running every interval seconds and counts the innermost
+    line of code from sunburst_dir, so the counts are weighted by the
+    time spent on each line. lines run for less than the interval may never
+    be seen
+
+    arguments:
+        sunburst_dir: only code in this directory is counted, like the other
+            tracers, None counts everything
+        start_function, end_function: like the other tracers, samples are
+            only kept while start_function is running and sampling ends when
+            end_function is caught running or start_function returns. None
+            samples from start() until stop()
+        interval: seconds between samples
+        thread_id: the thread to sample, by default the one calling start()
+
+    """
+
+    def __init__(self, sunburst_dir, start_function=None, end_function=None,
+                 interval=0.005, thread_id=None):
+        self.counts = {}
+        self.lines = TraceLines(self.counts)
+        self.sunburst_dir = sunburst_dir
+        self.start_function = getattr(start_function, '__name__', None)
+        self.end_function = getattr(end_function, '__name__', None)
+        self.interval = interval
+        self.thread_id = thread_id
+        self.samples = 0
+        self.in_trace = False
+        self.traced = False
+        # code object -> is it in the sunburst directory?
+        self.wanted = {}
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        """start sampling in a background thread"""
+        if self.thread_id is None:
+            self.thread_id = threading.get_ident()
+        self.thread = threading.Thread(target=self.run, name='sunburst-sampler',
+                                       daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """stop sampling, the counts so far are kept"""
+        self.stopped.set()
+        if self.thread is not None and \
+                self.thread is not threading.current_thread():
+            self.thread.join()
+        self.traced = True
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                # the traced thread has finished
+                break
+            self.sample(frame)
+        self.traced = True
+
+    def is_wanted(self, code):
+        wanted = self.wanted.get(code)
+        if wanted is None:
+            filedir = os.path.dirname(os.path.abspath(code.co_filename))
+            wanted = (self.sunburst_dir is None or
+                      filedir == self.sunburst_dir)
+            self.wanted[code] = wanted
+        return wanted
+
+    def sample(self, frame):
+        """count the line the traced thread is on"""
+        line = None
+        started = self.start_function is None
+        ending = False
+        # walk out from the innermost frame
+        while frame is not None:
+            code = frame.f_code
+            if line is None and self.is_wanted(code):
+                line = (code.co_filename, frame.f_lineno)
+            if code.co_name == self.start_function:
+                started = True
+            elif code.co_name == self.end_function:
+                ending = True
+            frame = frame.f_back
+
+        # stop for good once end_function runs, or start_function returns
+        if self.in_trace and (ending or not started):
+            self.in_trace = False
+            self.stopped.set()
+            return
+        self.in_trace = started
+        if started and line is not None:
+            self.counts[line] = self.counts.get(line, 0) + 1
+            self.samples += 1
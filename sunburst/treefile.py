@@ -0,0 +1,279 @@
+"""save word counts and their prefix tree in a binary file that opens
+instantly, so a diagram can be drawn again without parsing anything
+
+    python -m sunburst.treefile write SOURCE_DIR counts.sbt
+    python -m sunburst.treefile info counts.sbt
+    python run.py --tree counts.sbt
+
+loading maps the file into memory and the arrays are numpy views straight
+onto it, nothing is copied or turned into python objects until it's used
+
+the format, every number is little endian:
+
+    offset  size
+    0       8     magic, b'SUNBTREE'
+    8       4     version, uint32
+    12      4     number of sections, uint32
+    16      8     max_depth the tree was built with, int64, -1 for none
+    24      32*n  the section table, 32 bytes for each section:
+                  name, 16 bytes of ascii padded with zeros
+                  offset of the section from the start of the file, uint64
+                  number of items in the section, uint64
+
+every section starts at a multiple of 8 bytes, and its items are of the
+type listed in SECTIONS. the tree is a FlatTree: one row per node, breadth
+first, row 0 the root. symbol ids index into the symbols, id 0 is '' which
+marks the end of a word. the words are sorted by their utf-8 bytes
+
+"""
+
+import argparse
+import mmap
+import os
+import struct
+from bisect import bisect_left
+
+import numpy as np
+
+from .layout import FlatTree
+from .sequences import build_tree
+
+
+MAGIC = b'SUNBTREE'
+VERSION = 1
+HEADER = struct.Struct('<8sIIq')
+ENTRY = struct.Struct('<16sQQ')
+ALIGN = 8
+
+# every section in the file, in order, with the type of its items
+SECTIONS = [
+    ('symbols_blob', '<u1'),     # the letter of every symbol, utf-8
+    ('symbols_offset', '<i8'),   # where each letter starts, and the end
+    ('symbol', '<i4'),
+    ('freq', '<i8'),
+    ('parent', '<i8'),
+    ('level', '<i4'),
+    ('first_child', '<i8'),
+    ('n_children', '<i8'),
+    ('words_blob', '<u1'),       # every word, utf-8, back to back
+    ('words_offset', '<i8'),     # where each word starts, and the end
+    ('words_freq', '<i8'),
+]
+
+
+def pack_strings(strings):
+    """utf-8 encoded strings back to back, and the offsets between them"""
+    encoded = [string.encode('utf-8') for string in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype='<i8')
+    np.cumsum([len(string) for string in encoded], out=offsets[1:])
+    return np.frombuffer(b''.join(encoded), dtype='<u1'), offsets
+
+
+def write_tree_file(file_name, words, max_depth=None, tree=None):
+    """save a {word: freq} dict and its prefix tree
+
+    arguments:
+        file_name: where to write it
+        words: the word counts
+        max_depth: how deep to build the tree, None for the whole thing
+        tree: a FlatTree of words built to max_depth, built here if None
+
+    """
+    if tree is None:
+        tree = build_tree(words, max_depth)
+    vocabulary = sorted(words, key=lambda word: word.encode('utf-8'))
+    symbols_blob, symbols_offset = pack_strings(tree.symbols)
+    words_blob, words_offset = pack_strings(vocabulary)
+    arrays = {
+        'symbols_blob': symbols_blob,
+        'symbols_offset': symbols_offset,
+        'symbol': tree.symbol,
+        'freq': tree.freq,
+        'parent': tree.parent,
+        'level': tree.level,
+        'first_child': tree.first_child,
+        'n_children': tree.n_children,
+        'words_blob': words_blob,
+        'words_offset': words_offset,
+        'words_freq': np.array([words[word] for word in vocabulary],
+                               dtype='<i8'),
+    }
+
+    # work out where each section goes before writing anything
+    offset = HEADER.size + ENTRY.size*len(SECTIONS)
+    table = []
+    for name, dtype in SECTIONS:
+        offset += -offset % ALIGN
+        array = np.ascontiguousarray(arrays[name], dtype=dtype)
+        table.append((name, offset, array))
+        offset += array.nbytes
+
+    # written next to the real file and moved over it, so a crash never
+    # leaves half a file behind
+    temp_name = '%s.%d.tmp' % (file_name, os.getpid())
+    with open(temp_name, 'wb') as tree_file:
+        tree_file.write(HEADER.pack(MAGIC, VERSION, len(SECTIONS),
+                                    -1 if max_depth is None else max_depth))
+        for name, offset, array in table:
+            tree_file.write(ENTRY.pack(name.encode('ascii'), offset,
+                                       len(array)))
+        for name, offset, array in table:
+            tree_file.write(b'\0'*(offset - tree_file.tell()))
+            tree_file.write(array.tobytes())
+    os.replace(temp_name, file_name)
+
+
+class Vocabulary(object):
+    """the saved word counts, used like a read only {word: freq} dict. words
+    are only decoded when they're asked for, lookups are a binary search"""
+
+    def __init__(self, blob, offsets, freq):
+        self.blob = blob
+        self.offsets = offsets
+        self.freq = freq
+
+    def __len__(self):
+        return len(self.freq)
+
+    def word(self, index):
+        start, end = self.offsets[index], self.offsets[index+1]
+        return self.blob[start:end].tobytes().decode('utf-8')
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self.word(index)
+
+    def index(self, word):
+        """the position of word, or -1 if it isn't there"""
+        key = word.encode('utf-8')
+        # the bytes of each word are compared as they're needed
+        words = _EncodedWords(self)
+        index = bisect_left(words, key)
+        if index < len(self) and words[index] == key:
+            return index
+        return -1
+
+    def __contains__(self, word):
+        return self.index(word) >= 0
+
+    def __getitem__(self, word):
+        index = self.index(word)
+        if index < 0:
+            raise KeyError(word)
+        return int(self.freq[index])
+
+    def get(self, word, default=None):
+        index = self.index(word)
+        return default if index < 0 else int(self.freq[index])
+
+    def items(self):
+        for index in range(len(self)):
+            yield self.word(index), int(self.freq[index])
+
+    def as_dict(self):
+        return dict(self.items())
+
+
+class _EncodedWords(object):
+    """a sequence view of the encoded words, just enough for bisect"""
+
+    def __init__(self, vocabulary):
+        self.vocabulary = vocabulary
+
+    def __len__(self):
+        return len(self.vocabulary)
+
+    def __getitem__(self, index):
+        offsets = self.vocabulary.offsets
+        return self.vocabulary.blob[offsets[index]:offsets[index+1]].tobytes()
+
+
+class TreeFile(object):
+    """a file written by write_tree_file, mapped into memory
+
+    attributes:
+        tree: the FlatTree, its arrays are views onto the file
+        words: the Vocabulary
+        max_depth: how deep the tree was built, None for no limit
+
+    """
+
+    def __init__(self, file_name):
+        with open(file_name, 'rb') as tree_file:
+            self.map = mmap.mmap(tree_file.fileno(), 0,
+                                 access=mmap.ACCESS_READ)
+        magic, version, n_sections, max_depth = HEADER.unpack_from(self.map)
+        if magic != MAGIC:
+            raise ValueError('%s is not a sunburst tree file' % file_name)
+        if version != VERSION:
+            raise ValueError('%s is version %d, only version %d can be read'
+                             % (file_name, version, VERSION))
+        self.max_depth = None if max_depth < 0 else max_depth
+
+        dtypes = dict(SECTIONS)
+        arrays = {}
+        for index in range(n_sections):
+            name, offset, count = ENTRY.unpack_from(
+                self.map, HEADER.size + index*ENTRY.size)
+            name = name.rstrip(b'\0').decode('ascii')
+            if name in dtypes:
+                arrays[name] = np.frombuffer(self.map, dtype=dtypes[name],
+                                             count=count, offset=offset)
+        missing = set(dtypes) - set(arrays)
+        if missing:
+            raise ValueError('%s is missing %s' % (file_name,
+                                                   ', '.join(sorted(missing))))
+
+        # there are only ever a handful of symbols
+        blob, offsets = arrays['symbols_blob'], arrays['symbols_offset']
+        symbols = [blob[offsets[index]:offsets[index+1]].tobytes()
+                   .decode('utf-8') for index in range(len(offsets) - 1)]
+        self.tree = FlatTree(symbols, arrays['symbol'], arrays['freq'],
+                             arrays['parent'], arrays['level'],
+                             arrays['first_child'], arrays['n_children'])
+        self.words = Vocabulary(arrays['words_blob'], arrays['words_offset'],
+                                arrays['words_freq'])
+
+
+def load_tree_file(file_name):
+    """open a file written by write_tree_file"""
+    return TreeFile(file_name)
+
+
+def main():
+    import yaml
+    from .code_parser import parse_source, INCLUDE, EXCLUDE
+
+    parser = argparse.ArgumentParser(
+        prog='python -m sunburst.treefile',
+        description='save word counts to draw from later')
+    parser.add_argument('--config', default='config.yaml')
+    commands = parser.add_subparsers(dest='command')
+    write = commands.add_parser('write', help='parse a source directory and '
+                                              'save its counts')
+    write.add_argument('source_dir')
+    write.add_argument('file_name')
+    info = commands.add_parser('info', help='describe a saved file')
+    info.add_argument('file_name')
+    args = parser.parse_args()
+
+    if args.command == 'write':
+        with open(args.config, 'r') as config:
+            data = yaml.safe_load(config)['data']
+        words = parse_source(args.source_dir, data['alphabet'],
+                             data['numbers'], data.get('include', INCLUDE),
+                             data.get('exclude', EXCLUDE),
+                             data.get('processes'), data.get('cache_dir'),
+                             data.get('max_words'))
+        write_tree_file(args.file_name, words, data['max_recursion'])
+    elif args.command == 'info':
+        saved = load_tree_file(args.file_name)
+        print('%d words, %d nodes, %d symbols, max depth %s' % (
+            len(saved.words), len(saved.tree), len(saved.tree.symbols),
+            saved.max_depth))
+    else:
+        parser.print_help()
+
+
+if __name__ == '__main__':
+    main()
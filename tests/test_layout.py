@@ -0,0 +1,106 @@
+"""build_tree and compute_layout against the recursive Sector classes they
+replaced, which are kept here in plain python as the reference"""
+
+import os
+
+import pytest
+import yaml
+
+from sunburst.code_parser import parse_source
+from sunburst.layout import compute_layout
+from sunburst.sequences import build_tree
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SETTINGS = yaml.safe_load(open(os.path.join(ROOT, 'config.yaml'), 'r'))
+
+
+def reference_sectors(words, max_level):
+    """every sector the original Sector.create_child_segments drew, as
+    {(prefix, end): (level, start_angle, end_angle, label, freq)}"""
+    sectors = {}
+
+    def visit(words, level, letter, start_angle, end_angle, freq, path):
+        if level > max_level:
+            return
+        if level > 0:
+            # end sectors were labelled with the whole word
+            label = path if letter == '' else letter
+            sectors[(path, letter == '')] = (level, start_angle, end_angle,
+                                             label, freq)
+        if letter == '':
+            return
+
+        # children in the order their letters are first seen
+        children = {}
+        for word in words:
+            freq = words[word]
+            if not word:
+                children[''] = [freq, {}]
+                continue
+            child = children.setdefault(word[0], [0, {}])
+            child[0] += freq
+            child[1][word[1:]] = freq
+        # most frequent first, ties stay in the order they were seen
+        ordered = sorted(children.items(), key=lambda item: -item[1][0])
+        total = float(sum(child[0] for child in children.values()))
+
+        arc = end_angle - start_angle
+        percent = 0
+        for child_letter, (child_freq, child_words) in ordered:
+            share = child_freq/total
+            visit(child_words, level + 1, child_letter,
+                  percent*arc + start_angle, (percent + share)*arc + start_angle,
+                  child_freq, path + child_letter)
+            percent += share
+
+    visit(words, 0, 'ORIGIN', 0, 360, 0, '')
+    return sectors
+
+
+def layout_sectors(words, max_level):
+    tree = build_tree(words, max_level)
+    layout = compute_layout(tree, (0, 0), SETTINGS['layer']['layer_width'],
+                            SETTINGS['layer']['sector_width'], max_level)
+    sectors = {}
+    for row in range(len(layout)):
+        end = bool(layout.end[row])
+        sectors[(tree.word(layout.node[row]), end)] = (
+            int(layout.level[row]), float(layout.start_angle[row]),
+            float(layout.end_angle[row]), layout.label(row),
+            int(layout.freq[row]))
+    return sectors
+
+
+def assert_same_sectors(words, max_level):
+    expected = reference_sectors(words, max_level)
+    actual = layout_sectors(words, max_level)
+    assert sorted(actual) == sorted(expected)
+    for key in expected:
+        level, start_angle, end_angle, label, freq = expected[key]
+        assert actual[key][0] == level
+        assert actual[key][3] == label
+        assert actual[key][4] == freq
+        assert actual[key][1] == pytest.approx(start_angle, abs=1e-9)
+        assert actual[key][2] == pytest.approx(end_angle, abs=1e-9)
+
+
+def test_this_repo():
+    data = SETTINGS['data']
+    words = parse_source(os.path.join(ROOT, 'sunburst'), data['alphabet'],
+                         data['numbers'], processes=1)
+    assert_same_sectors(words, data['max_recursion'])
+
+
+def test_wordlist():
+    words = {}
+    with open(os.path.join(ROOT, 'wordlist'), 'r') as wordlist:
+        for line in wordlist:
+            word, freq = line.strip().rsplit(',', 1)
+            words[word] = int(freq)
+    assert_same_sectors(words, 6)
+
+
+def test_shallow():
+    # words longer than max_level never get an end sector
+    assert_same_sectors({'abc': 3, 'ab': 2, 'b': 2, 'abd': 1}, 2)
@@ -0,0 +1,87 @@
+"""counts saved and loaded, or kept up to date in place, come back the same"""
+
+import os
+
+import numpy as np
+
+from sunburst.incremental import CountTree
+from sunburst.parse_cache import ParseCache
+from sunburst.sequences import build_tree, split_counts
+from sunburst.treefile import load_tree_file, write_tree_file
+
+
+WORDS = {'the': 5, 'then': 2, 'there': 2, 'a': 4, 'an': 1, 'and': 3,
+         'zebra': 1}
+
+
+def nodes(tree):
+    """every node of a FlatTree by its prefix, the order of the rows aside"""
+    return sorted((tree.word(node), int(tree.level[node]),
+                   tree.symbols[tree.symbol[node]], int(tree.freq[node]))
+                  for node in range(len(tree)))
+
+
+def test_count_tree_flat():
+    for max_depth in (None, 2, 4):
+        counts = CountTree(max_depth)
+        counts.add(WORDS)
+        assert nodes(counts.flat()) == nodes(build_tree(WORDS, max_depth))
+
+
+def test_count_tree_update():
+    counts = CountTree(4)
+    counts.add(WORDS)
+    counts.add({'then': -2, 'zebra': -1, 'anthem': 3})
+    words = dict(WORDS, anthem=3)
+    del words['then'], words['zebra']
+    flat = counts.flat()
+    assert nodes(flat) == nodes(build_tree(words, 4))
+    # the children of a node are next to each other, most frequent first
+    for node in range(len(flat)):
+        first = flat.first_child[node]
+        children = np.arange(first, first + flat.n_children[node])
+        assert (flat.parent[children] == node).all()
+        assert (np.diff(flat.freq[children]) <= 0).all()
+
+
+def test_count_tree_separator():
+    paths = {'/usr/lib/a': 3, '/usr/lib/b': 2, '/usr/bin/x': 5, '/etc/': 1}
+    counts = CountTree(2, '/')
+    counts.add(paths)
+    assert nodes(counts.flat()) == nodes(
+        build_tree(split_counts(paths, '/'), 2, '/'))
+
+
+def test_tree_file(tmp_path):
+    file_name = str(tmp_path / 'counts.sbt')
+    write_tree_file(file_name, WORDS, 3)
+    saved = load_tree_file(file_name)
+    assert saved.max_depth == 3
+    assert saved.words.as_dict() == WORDS
+    expected = build_tree(WORDS, 3)
+    for name in ('symbol', 'freq', 'parent', 'level', 'first_child',
+                 'n_children'):
+        assert (getattr(saved.tree, name) == getattr(expected, name)).all()
+    assert saved.tree.symbols == expected.symbols
+
+
+def test_parse_cache(tmp_path):
+    source = tmp_path / 'source.py'
+    source.write_text('the then there\n')
+    cache_dir = str(tmp_path / 'cache')
+
+    cache = ParseCache(cache_dir, 'abc', False)
+    assert cache.lookup(str(source)) is None
+    cache.store(str(source), WORDS)
+    cache.save()
+
+    # a new run finds it by mtime and size
+    cache = ParseCache(cache_dir, 'abc', False)
+    assert cache.lookup(str(source)) == WORDS
+    # and by contents once the mtime changes
+    os.utime(str(source), ns=(0, 0))
+    assert ParseCache(cache_dir, 'abc', False).lookup(str(source)) == WORDS
+    # other parser settings don't share counts
+    assert ParseCache(cache_dir, 'abd', False).lookup(str(source)) is None
+    assert ParseCache(cache_dir, 'abc', False,
+                      max_words=10).lookup(str(source)) is None